@@ -0,0 +1,55 @@
+import os, sys
+from datetime import date
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torpedo_dados
+
+
+# cada teste com a sua pasta de cache (snapshots/meta), sem tocar em .torpedo_cache
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(torpedo_dados, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+# XLSX no layout posicional da base: linhas = [(nota, data)]
+def montar_xlsx(linhas: list, colab: str = "ANA") -> bytes:
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["A", "NOTAS", "TIPO", "LOCAL", "DATA", "F", "G", "COLAB"])
+    for nota, data in linhas:
+        ws.append([None, nota, "INSPEÇÃO", "BELÉM", data, None, None, colab])
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+@pytest.fixture
+def xlsx_base():
+    return montar_xlsx
+
+
+# CSV no layout posicional: registros = [(nota, tipo, local, "dd/mm/aaaa", colab)]
+def montar_csv(registros: list) -> bytes:
+    linhas = ["A;NOTAS;TIPO;LOCAL;DATA;F;G;COLAB"] + [f";{n};{t};{l};{d};;;{c}" for n, t, l, d, c in registros]
+    return ("\n".join(linhas) + "\n").encode("utf-8")
+
+# S04..S06 de 2024 (seg–sex), 3 colaboradores em 2 localidades, + 1 nota em dez/2023
+def registros_exemplo() -> list:
+    registros = [("0", "REPARO", "A", "20/12/2023", "ANA")]
+    for sem in (4, 5, 6):
+        for d in range(5):
+            dia = date.fromisocalendar(2024, sem, d + 1).strftime("%d/%m/%Y")
+            for k, (colab, local) in enumerate([("ANA", "A"), ("BIA", "A"), ("CAIO", "B")]):
+                for q in range(1 + (sem + d + k) % 3):
+                    registros.append((f"{sem}{d}{k}{q}", "INSPEÇÃO" if q else "REPARO", local, dia, colab))
+    return registros
+
+@pytest.fixture
+def cubo_exemplo():
+    df_raw, _ = torpedo_dados.ler_base_bytes(montar_csv(registros_exemplo()))
+    return torpedo_dados.montar_cubo(torpedo_dados.preparar_base(df_raw))
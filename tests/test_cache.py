@@ -0,0 +1,42 @@
+import threading, time
+
+from torpedo_cache import CacheCoalescido
+
+
+def test_cargas_simultaneas_viram_uma():
+    cache = CacheCoalescido(ttl=60)
+    chamadas = []
+    liberar = threading.Event()
+
+    def carregar():
+        chamadas.append(1)
+        liberar.wait(5)
+        return "base"
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(cache.obter("url", carregar))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    liberar.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(chamadas) == 1
+    assert resultados == ["base"] * 8
+
+def test_renovacao_com_erro_registra_erro_e_horario_juntos():
+    cache = CacheCoalescido(ttl=60)
+    cache.obter("url", lambda: "v1")
+
+    def falhar():
+        raise RuntimeError("drive fora")
+
+    cache.agendar_renovacao("url", falhar, intervalo=3600)
+    cache._renovar("url")
+    cache.parar()
+
+    estado = cache.estado("url")
+    assert estado["erro_renovacao"] == "drive fora"
+    assert estado["ultima_renovacao"] is not None
+    assert cache.obter("url", falhar) == "v1"
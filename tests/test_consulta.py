@@ -0,0 +1,32 @@
+from datetime import date
+
+import pandas as pd
+
+from torpedo_dados import ConsultaBase
+
+
+def test_recortes_derivados_so_estreitam(cubo_exemplo):
+    q = ConsultaBase(cubo_exemplo, "_DIA_")
+    q_sem = q.semana_iso(2024, 5, dias=5)
+
+    # ano() depois da semana continua na semana (interseção, não troca)
+    q_sem_ano = q_sem.ano(2024)
+    assert q_sem_ano.limites() == q_sem.limites()
+    assert q_sem_ano.soma() == q_sem.soma() < q.ano(2024).soma()
+    assert q_sem_ano.unicos("_SEMANA_") == [5]
+
+    # entre() mais largo que o recorte atual não amplia
+    q_ano = q.ano(2024)
+    assert q_ano.entre(date(2023, 1, 1), date(2025, 12, 31)).soma() == q_ano.soma()
+    assert q_ano.limites()[0] == pd.Timestamp(2024, 1, 22)
+
+    # períodos disjuntos: consulta vazia
+    assert q_sem.semana_iso(2024, 6).vazia()
+
+def test_filtros_e_recortes_combinam(cubo_exemplo):
+    q = ConsultaBase(cubo_exemplo, "_DIA_").ano(2024)
+    q_a = q.onde("_LOCAL_", "A")
+
+    assert q_a.categorias("_COLAB_") == ["ANA", "BIA"]
+    assert q_a.soma() + q.onde("_LOCAL_", "B").soma() == q.soma()
+    assert q_a.semana_iso(2024, 4).soma() + q_a.semana_iso(2024, 5).soma() + q_a.semana_iso(2024, 6).soma() == q_a.soma()
@@ -0,0 +1,29 @@
+from torpedo_dados import ler_csv_enxuto
+
+
+def _csv(linhas: list[str]) -> str:
+    cab = "A;NOTAS;TIPO;LOCAL;DATA;F;G;COLAB"
+    return "\n".join([cab] + linhas) + "\n"
+
+
+def test_cp1252_depois_de_amostra_ascii():
+    # início só ASCII (maior que a amostra de detecção) e acentos cp1252 no fim
+    inicio = [f";{k};INSPECAO;MACAPA;05/03/2024;;;ANA" for k in range(3000)]
+    fim = [";9001;INSPEÇÃO;BELÉM;06/03/2024;;;JOSÉ"]
+    raw = _csv(inicio + fim).encode("cp1252")
+    assert len(raw) > 64 * 1024
+
+    df, leitura = ler_csv_enxuto(raw)
+
+    assert leitura["encoding"] == "cp1252"
+    assert df["LOCAL"].iloc[-1] == "BELÉM"
+    assert df["COLAB"].iloc[-1] == "JOSÉ"
+    assert set(df["LOCAL"].astype(str)) == {"MACAPA", "BELÉM"}
+
+def test_utf8_e_separador():
+    raw = _csv([";1;INSPEÇÃO;BELÉM;05/03/2024;;;JOSÉ"]).replace(";", ",").encode("utf-8")
+
+    df, leitura = ler_csv_enxuto(raw)
+
+    assert (leitura["encoding"], leitura["sep"]) == ("utf-8", ",")
+    assert df["COLAB"].tolist() == ["JOSÉ"]
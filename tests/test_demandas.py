@@ -0,0 +1,37 @@
+from datetime import date
+
+from torpedo_demandas import gravar_lote, ler_intervalo, ler_semana, limpar_semana
+from torpedo_lote import _linhas_tabela
+
+
+def test_gravar_ler_e_apagar(tmp_path):
+    db = str(tmp_path / "demandas.sqlite")
+    gravar_lote("2024-03-04", [(1, "ANA", "2024-03-04", "ANEXO DE AR"), (2, "BIA", "2024-03-05", "LAUDO")], db)
+    gravar_lote("2024-03-04", [(2, "BIA", "2024-03-05", "-")], db)
+
+    assert ler_semana("2024-03-04", db) == {(1, "ANA", "2024-03-04"): "ANEXO DE AR"}
+    assert limpar_semana("2024-03-04", db) == 1
+    assert ler_semana("2024-03-04", db) == {}
+
+def test_intervalo_por_chave_estruturada_para_o_lote(tmp_path):
+    db = str(tmp_path / "demandas.sqlite")
+    nome = "SILVA | JOSÉ"  # "|" no nome não pode quebrar a busca
+    gravar_lote("2024-03-04", [(1, nome, "2024-03-04", "BAIXA DE LAUDO"), (1, nome, "2024-03-06", "ANEXO DE AR")], db)
+    gravar_lote("2024-03-11", [(3, nome, "2024-03-11", "LAUDO")], db)
+    gravar_lote("2024-04-01", [(1, nome, "2024-04-01", "FORA")], db)
+
+    demandas = ler_intervalo("2024-03-04", "2024-03-11", db)
+
+    assert demandas == {
+        ("2024-03-04", nome, "2024-03-04"): "BAIXA DE LAUDO",
+        ("2024-03-04", nome, "2024-03-06"): "ANEXO DE AR",
+        ("2024-03-11", nome, "2024-03-11"): "LAUDO",
+    }
+    assert _linhas_tabela(date(2024, 3, 4), nome, demandas) == (
+        ("2024-03-04", "SEG", "BAIXA DE LAUDO"),
+        ("2024-03-05", "TER", "-"),
+        ("2024-03-06", "QUA", "ANEXO DE AR"),
+        ("2024-03-07", "QUI", "-"),
+        ("2024-03-08", "SEX", "-"),
+    )
+    assert [d for _, _, d in _linhas_tabela(date(2024, 3, 11), nome, demandas)][0] == "LAUDO"
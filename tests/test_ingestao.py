@@ -0,0 +1,52 @@
+import pandas as pd
+
+from torpedo_dados import ingerir_base, ler_base_bytes, montar_cubo, preparar_base
+from conftest import montar_csv, registros_exemplo
+
+
+def _raw(registros):
+    return ler_base_bytes(montar_csv(registros))[0]
+
+def _comparavel(df: pd.DataFrame) -> pd.DataFrame:
+    # categorias podem vir em outra ordem (union_categoricals): compara pelos valores
+    return df.apply(lambda s: s.astype(object) if isinstance(s.dtype, pd.CategoricalDtype) else s)
+
+def test_incremental_igual_a_reconstrucao_completa():
+    registros = registros_exemplo()
+    cauda = [
+        ("9001", "REPARO", "A", "08/02/2024", "ANA"),
+        ("9002", "LAUDO", "C", "24/01/2024", "DUDA"),   # data antes da marca d'água + colaboradora/localidade novas
+        ("9003", "REPARO", "B", "12/02/2024", "CAIO"),
+    ]
+    anterior = ingerir_base(_raw(registros))
+    raw_total = _raw(registros + cauda)
+
+    atual = ingerir_base(raw_total, anterior)
+
+    assert atual["ingestao"] == {"modo": "incremental", "linhas_novas": 3}
+    df_full = preparar_base(raw_total)
+    pd.testing.assert_frame_equal(_comparavel(atual["df"]), _comparavel(df_full))
+    pd.testing.assert_frame_equal(_comparavel(atual["cubo"]), _comparavel(montar_cubo(df_full)))
+
+def test_linha_antiga_editada_refaz_tudo():
+    registros = registros_exemplo()
+    anterior = ingerir_base(_raw(registros))
+    # colaborador corrigido numa linha antiga + 1 linha nova no fim
+    editados = list(registros)
+    editados[5] = editados[5][:4] + ("ZECA",)
+    raw_total = _raw(editados + [("9001", "REPARO", "A", "08/02/2024", "ANA")])
+
+    atual = ingerir_base(raw_total, anterior)
+
+    assert atual["ingestao"] == {"modo": "completa", "linhas_novas": len(raw_total)}
+    assert "ZECA" in atual["cubo"]["_COLAB_"].astype(str).tolist()
+    pd.testing.assert_frame_equal(_comparavel(atual["df"]), _comparavel(preparar_base(raw_total)))
+
+def test_base_igual_fica_inalterada():
+    raw = _raw(registros_exemplo())
+    anterior = ingerir_base(raw)
+
+    atual = ingerir_base(_raw(registros_exemplo()), anterior)
+
+    assert atual["ingestao"] == {"modo": "inalterada", "linhas_novas": 0}
+    assert atual["df"] is anterior["df"] and atual["cubo"] is anterior["cubo"]
@@ -0,0 +1,44 @@
+import zipfile
+from datetime import date
+from io import BytesIO
+
+from torpedo_dados import ConsultaBase
+from torpedo_lote import exportar_lote, montar_tarefas
+
+
+def _selecao_da_tela(cubo):
+    # como o app monta q_filtro: ano → semana S05 → Localidade A
+    return ConsultaBase(cubo, "_DIA_").ano(2024).entre(date(2024, 1, 29), date(2024, 2, 2)).onde("_LOCAL_", "A")
+
+def test_lote_de_varias_semanas_com_uma_semana_selecionada(cubo_exemplo):
+    q_filtro = _selecao_da_tela(cubo_exemplo)
+    q_local = ConsultaBase(cubo_exemplo, "_DIA_").onde("_LOCAL_", "A")
+
+    tarefas = montar_tarefas(q_filtro, 2024, [4, 5, 6], modo="semanas")
+
+    assert [t["arquivo"] for t in tarefas] == [
+        "Torpedo_Semanal_2024_20240122.pdf",
+        "Torpedo_Semanal_2024_20240129.pdf",
+        "Torpedo_Semanal_2024_20240205.pdf",
+    ]
+    for t, sem in zip(tarefas, [4, 5, 6]):
+        _ano, _periodo, total_semana, total_ano, tabelas = t["args"]
+        assert total_semana == q_local.semana_iso(2024, sem).soma()
+        # total do ano inteiro (com o filtro de Localidade), não o da semana da tela
+        assert total_ano == q_local.ano(2024).soma() > total_semana
+        assert {nome.split(" - ")[1] for nome, _ in tabelas} == {"ANA", "BIA"}
+
+    with zipfile.ZipFile(BytesIO(exportar_lote(tarefas, workers=1))) as zf:
+        assert zf.namelist() == [t["arquivo"] for t in tarefas]
+        assert all(zf.read(n).startswith(b"%PDF") for n in zf.namelist())
+
+def test_lote_por_colaborador_usa_o_total_do_ano_da_pessoa(cubo_exemplo):
+    q_filtro = _selecao_da_tela(cubo_exemplo)
+    demandas = {("2024-01-22", "BIA", "2024-01-23"): "LAUDO"}
+
+    tarefas = montar_tarefas(q_filtro, 2024, [4, 6], modo="colaboradores", demandas=demandas, colaboradores=["BIA"])
+
+    assert [t["arquivo"] for t in tarefas] == ["BIA/Torpedo_2024_20240122_BIA.pdf", "BIA/Torpedo_2024_20240205_BIA.pdf"]
+    q_bia = ConsultaBase(cubo_exemplo, "_DIA_").onde("_COLAB_", "BIA")
+    assert tarefas[0]["args"][3] == q_bia.ano(2024).soma()
+    assert tarefas[0]["args"][4][0][1][1] == ("2024-01-23", "TER", "LAUDO")
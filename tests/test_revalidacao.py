@@ -0,0 +1,125 @@
+import os, threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import torpedo_dados
+from torpedo_dados import carregar_base_revalidando, chave_snapshot
+
+
+# servidor local no lugar do Drive: corpo/ETag trocáveis pelo teste, registra os pedidos
+class _Drive(BaseHTTPRequestHandler):
+    def do_GET(self):
+        srv = self.server
+        pedido = {"if_none_match": self.headers.get("If-None-Match")}
+        srv.pedidos.append(pedido)
+        if srv.ao_receber:
+            srv.ao_receber(pedido)
+
+        if srv.etag and pedido["if_none_match"] == srv.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(srv.corpo)))
+        if srv.etag:
+            self.send_header("ETag", srv.etag)
+        self.end_headers()
+        self.wfile.write(srv.corpo)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def drive(xlsx_base):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Drive)
+    srv.corpo = xlsx_base([("1", datetime(2024, 3, 4)), ("2", datetime(2024, 3, 5))])
+    srv.etag = '"v1"'
+    srv.pedidos = []
+    srv.ao_receber = None
+    srv.url = f"http://127.0.0.1:{srv.server_address[1]}/base.xlsx"
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_200_depois_304(cache_dir, drive):
+    df1, info1 = carregar_base_revalidando(drive.url)
+    df2, info2 = carregar_base_revalidando(drive.url)
+
+    assert (info1["status"], info1["via"]) == ("miss", "download")
+    assert (info2["status"], info2["via"]) == ("hit", "304")
+    assert drive.pedidos[1]["if_none_match"] == '"v1"'
+    assert info2["hash"] == info1["hash"]
+    assert df2.equals(df1)
+
+def test_etag_novo_e_conteudo_novo_e_miss(cache_dir, drive, xlsx_base):
+    _, info1 = carregar_base_revalidando(drive.url)
+    drive.corpo = xlsx_base([("1", datetime(2024, 3, 4)), ("2", datetime(2024, 3, 5)), ("3", datetime(2024, 3, 6))])
+    drive.etag = '"v2"'
+
+    df2, info2 = carregar_base_revalidando(drive.url)
+
+    assert (info2["status"], info2["via"]) == ("miss", "download")
+    assert info2["hash"] != info1["hash"]
+    assert len(df2) == 3
+
+def test_mesmo_corpo_sem_etag_e_hit_por_hash(cache_dir, drive):
+    drive.etag = None
+    _, info1 = carregar_base_revalidando(drive.url)
+    _, info2 = carregar_base_revalidando(drive.url)
+
+    assert drive.pedidos[1]["if_none_match"] is None
+    assert (info2["status"], info2["via"]) == ("hit", "hash")
+    assert info2["hash"] == info1["hash"]
+
+def test_304_sem_snapshot_baixa_de_novo_sem_condicional(cache_dir, drive):
+    _, info1 = carregar_base_revalidando(drive.url)
+    snapshot = torpedo_dados._caminho_snapshot(chave_snapshot(info1["hash"]))
+
+    # o snapshot some entre a checagem local e a resposta 304 (evicção por outro processo)
+    def apagar_snapshot(pedido):
+        if pedido["if_none_match"] and os.path.exists(snapshot):
+            os.remove(snapshot)
+    drive.ao_receber = apagar_snapshot
+
+    df2, info2 = carregar_base_revalidando(drive.url)
+
+    assert [p["if_none_match"] for p in drive.pedidos] == [None, '"v1"', None]
+    assert (info2["status"], info2["via"]) == ("miss", "download")
+    assert info2["hash"] == info1["hash"]
+    assert len(df2) == 2
+    assert os.path.exists(snapshot)
+
+
+def _xlsx_duas_abas(xlsx_base) -> bytes:
+    from io import BytesIO
+    from openpyxl import load_workbook
+    wb = load_workbook(BytesIO(xlsx_base([("1", datetime(2024, 3, 4))], colab="ANA")))
+    ws = wb.create_sheet("NORTE")
+    ws.append(["A", "NOTAS", "TIPO", "LOCAL", "DATA", "F", "G", "COLAB"])
+    for k in range(3):
+        ws.append([None, f"N{k}", "REPARO", "MACAPÁ", datetime(2024, 3, 5 + k), None, None, "BIA"])
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+def test_varias_fontes_mesma_url_com_abas(cache_dir, drive, xlsx_base, monkeypatch):
+    # uma URL alimentando duas abas: parse das duas em processos, meta/snapshots por aba
+    monkeypatch.setattr(torpedo_dados, "FONTES_PROCESSOS", 2)
+    drive.corpo = _xlsx_duas_abas(xlsx_base)
+    fontes = [{"nome": "SUL", "url": drive.url, "aba": 0}, {"nome": "NORTE", "url": drive.url, "aba": "NORTE"}]
+
+    df, info = torpedo_dados.carregar_fontes(fontes, workers=2)
+
+    assert df[torpedo_dados.COL_FONTE].value_counts().to_dict() == {"NORTE": 3, "SUL": 1}
+    assert set(df["COLAB"].astype(str)) == {"ANA", "BIA"}
+    assert [f["via"] for f in info["fontes"]] == ["download", "download"]
+    assert not [p for p in os.listdir(cache_dir / "meta") if p.endswith(".tmp")]
+
+    _, info2 = torpedo_dados.carregar_fontes(fontes, workers=2)
+    assert info2["status"] == "hit"
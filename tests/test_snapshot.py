@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import pandas as pd
+
+from torpedo_dados import base_de_bytes, preparar_base
+
+
+def test_snapshot_devolve_o_mesmo_frame_com_data_mista(cache_dir, xlsx_base):
+    # coluna DATA do Excel com células de data (com e sem hora) e texto
+    raw = xlsx_base([
+        ("1", datetime(2024, 3, 5)),
+        ("2", datetime(2024, 3, 6, 14, 30)),
+        ("3", "07/03/2024"),
+        ("4", datetime(2024, 3, 8, 9, 0)),
+    ])
+
+    df1, leitura1 = base_de_bytes(raw)
+    df2, leitura2 = base_de_bytes(raw)
+
+    assert not leitura1["snapshot"] and leitura2["snapshot"]
+    pd.testing.assert_frame_equal(df1, df2)
+    assert len(preparar_base(df1)) == len(preparar_base(df2)) == 4
+    assert preparar_base(df2)["DATA"].dt.day.tolist() == [5, 6, 7, 8]
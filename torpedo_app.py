@@ -1,15 +1,21 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import requests, re
-from io import BytesIO
 from datetime import date, timedelta
 import streamlit.components.v1 as components
 
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
+from torpedo_dados import (
+    carregar_fontes, normalizar_fontes, ingerir_base, ConsultaBase,
+    versoes_por_ano, rollup_ano, serie_tendencia,
+)
+from torpedo_cache import CacheCoalescido
+from torpedo_demandas import ler_semana, ler_intervalo, gravar_lote, limpar_semana
+from torpedo_lote import montar_tarefas, exportar_lote, top_colaboradores, LOTE_WORKERS
+from torpedo_metricas import MedidorRerun, ativar_memoria, memoria_ativa
+from torpedo_visuais import (
+    fmt_int, html_torpedo_table, donut_colaborador_acumulado,
+    agregar_barras_semana, figura_barras, tabelas_para_tupla, pdf_torpedo_de_tabelas,
+    figura_tendencia,
+)
 
 
 # ======================================================
@@ -196,8 +202,6 @@ div[data-baseweb="segmented-control"] div[aria-checked="true"] span{
 # ======================================================
 # CONSTANTES
 # ======================================================
-DOW_PT = {0: "SEG", 1: "TER", 2: "QUA", 3: "QUI", 4: "SEX", 5: "SÁB", 6: "DOM"}
-
 OPCOES_DEMANDA = [
     "BAIXA DE LAUDO",
     "VIAGEM AO IMMETRO-PA",
@@ -213,141 +217,78 @@ OPCOES_DEMANDA = [
 # ======================================================
 # HELPERS
 # ======================================================
-def fmt_int(n: int) -> str:
-    return f"{int(n):,}".replace(",", ".")
-
 def monday_of_week(d: date) -> date:
     return d - timedelta(days=d.weekday())
 
-def _extrair_drive_id(url: str):
-    m = re.search(r"[?&]id=([a-zA-Z0-9-_]+)", url)
-    if m:
-        return m.group(1)
-    m = re.search(r"/file/d/([a-zA-Z0-9-_]+)", url)
-    if m:
-        return m.group(1)
-    return None
-
-def _drive_direct_download(url: str) -> str:
-    did = _extrair_drive_id(url)
-    if did:
-        return f"https://drive.google.com/uc?id={did}"
-    return url
-
-def _bytes_is_html(raw: bytes) -> bool:
-    head = raw[:800].lstrip().lower()
-    return head.startswith(b"<!doctype html") or b"<html" in head
-
-def _bytes_is_xlsx(raw: bytes) -> bool:
-    return raw[:2] == b"PK"
-
-@st.cache_data(ttl=600, show_spinner="🔄 Carregando base (XLSX/CSV)...")
-def carregar_base(url_original: str) -> pd.DataFrame:
-    url = _drive_direct_download(url_original)
-    r = requests.get(url, timeout=60)
-    r.raise_for_status()
-    raw = r.content
-
-    if _bytes_is_html(raw):
-        raise RuntimeError("URL retornou HTML (provável permissão/link). No Drive: 'Qualquer pessoa com o link' (Visualizador).")
-
-    if _bytes_is_xlsx(raw):
-        return pd.read_excel(BytesIO(raw), sheet_name=0, engine="openpyxl")
-
-    for enc in ["utf-8-sig", "utf-8", "cp1252", "latin1"]:
-        try:
-            return pd.read_csv(BytesIO(raw), sep=None, engine="python", encoding=enc)
-        except UnicodeDecodeError:
-            continue
-    return pd.read_csv(BytesIO(raw), sep=None, engine="python", encoding="utf-8", encoding_errors="replace")
+TTL_BASE_S = 600
+RENOVAR_ANTES_S = 90   # a renovação em segundo plano começa este tanto antes do TTL vencer
+
+# um cache por processo (não por sessão): o mesmo objeto é devolvido em cada rerun
+# — a base é tratada como somente leitura daqui pra frente
+@st.cache_resource
+def cache_bases() -> CacheCoalescido:
+    # versão = hash do conteúdo: derivados sobrevivem a uma recarga que trouxe os mesmos dados
+    return CacheCoalescido(ttl=TTL_BASE_S, versao=lambda valor: valor[1]["hash"])
+
+# chave = conjunto de fontes; cada fonte tem seu GET condicional e seu snapshot
+def carregar_base(chave: tuple, fontes: list[dict]) -> tuple[pd.DataFrame, dict]:
+    cache = cache_bases()
+    # GET condicional: base inalterada no Drive = sem download/parse (lê o snapshot em disco).
+    # Sessões que chegam durante a carga esperam a mesma carga.
+    carregar = lambda: carregar_fontes(fontes)
+    if cache.pronto(chave):
+        return cache.obter(chave, carregar)
+    with st.spinner("🔄 Carregando base (XLSX/CSV)..."):
+        return cache.obter(chave, carregar)
+
+# última base preparada (compartilhada entre sessões): ponto de partida da ingestão incremental
+@st.cache_resource
+def ultima_ingestao() -> dict:
+    return {}
+
+# derivado da base (chave = URL + versão dos dados): cai junto quando a base muda.
+# Base nova que só cresceu no fim: normaliza só as linhas novas e soma no cubo anterior.
+# Sem st.* aqui: também roda na thread de renovação.
+def _preparar(cache: CacheCoalescido, ultima: dict, chave: tuple, versao: str, df_raw: pd.DataFrame) -> dict:
+    def preparar():
+        estado = ingerir_base(df_raw, ultima.get("estado"))
+        ultima["estado"] = estado
+        return estado
+    return cache.derivado(chave, "preparada", versao, preparar)
+
+def base_preparada(chave: tuple, versao: str, df_raw: pd.DataFrame) -> dict:
+    with st.spinner("⚙️ Preparando base..."):
+        return _preparar(cache_bases(), ultima_ingestao(), chave, versao, df_raw)
+
+def versoes_anos(chave: tuple, versao: str, cubo: pd.DataFrame) -> dict:
+    return cache_bases().derivado(chave, "versoes_anos", versao, lambda: versoes_por_ano(cubo))
+
+# stale-while-revalidate: recarrega e já prepara a versão nova fora do rerun; a troca é atômica
+def ligar_renovacao(chave: tuple, fontes: list[dict]):
+    cache, ultima = cache_bases(), ultima_ingestao()
+
+    def depois(valor):
+        df_raw, info = valor
+        estado = _preparar(cache, ultima, chave, info["hash"], df_raw)
+        cache.derivado(chave, "versoes_anos", info["hash"], lambda: versoes_por_ano(estado["cubo"]))
+
+    cache.agendar_renovacao(chave, lambda: carregar_fontes(fontes), depois, antecedencia=RENOVAR_ANTES_S)
+
+# chave = (ano, hash do ano): se o upload só mudou o ano corrente, os outros anos vêm do cache
+@st.cache_resource(max_entries=32, show_spinner=False)
+def rollup_do_ano(ano: int, hash_ano: str, _cubo_ano: pd.DataFrame) -> pd.DataFrame:
+    return rollup_ano(_cubo_ano)
+
+# só roda quando o PDF é pedido; mesmas entradas = mesmos bytes (sem refazer o ReportLab)
+@st.cache_data(max_entries=32, show_spinner="📄 Gerando PDF...")
+def pdf_torpedo_bytes(ano_ref: str, periodo_txt: str, total_periodo: int, total_ano: int, tabelas: tuple) -> bytes:
+    return pdf_torpedo_de_tabelas(ano_ref, periodo_txt, total_periodo, total_ano, tabelas)
 
 def validar_estrutura_posicional(df: pd.DataFrame):
+    # a checagem de colunas (até H) é feita na leitura; aqui só a base vazia
     if df is None or df.empty:
         st.error("Base vazia.")
         st.stop()
-    if len(df.columns) < 8:
-        st.error("A base precisa ter pelo menos até a coluna H (8 colunas).")
-        st.stop()
-
-def normalize_colab_series(s: pd.Series) -> pd.Series:
-    s = s.astype(str).str.upper().str.strip()
-    return s.replace({"": None, "NAN": None, "NONE": None, "NULL": None, "-": None})
-
-def html_torpedo_table(title: str, head_class: str, df_rows: pd.DataFrame) -> str:
-    linhas = []
-    for _, r in df_rows.iterrows():
-        dstr = pd.to_datetime(r["Data"]).strftime("%d/%m/%Y")
-        linhas.append(
-            f"<tr>"
-            f"<td class='col-date'>{dstr}</td>"
-            f"<td class='col-dow'>{r['DOW']}</td>"
-            f"<td>{r['Demanda']}</td>"
-            f"</tr>"
-        )
-    body = "\n".join(linhas)
-    return f"""
-    <div class="tblwrap">
-      <div class="tblhead {head_class}">{title}</div>
-      <table class="tbl"><tbody>{body}</tbody></table>
-    </div>
-    """
-
-def achar_coluna_por_nome(df: pd.DataFrame, nomes_possiveis: list[str]):
-    cols = [str(c).upper().strip() for c in df.columns]
-    for i, c in enumerate(cols):
-        for n in nomes_possiveis:
-            if n in c:
-                return df.columns[i]
-    return None
-
-
-# ======================================================
-# DONUT
-# ======================================================
-def donut_colaborador_acumulado(df_base: pd.DataFrame, ano_ref: int | None):
-    if df_base.empty:
-        return None, 0
-
-    base = df_base.copy()
-    if ano_ref is not None:
-        base = base[base[COL_DATA].dt.year == int(ano_ref)].copy()
-
-    base = base.dropna(subset=["_COLAB_"]).copy()
-    if base.empty:
-        return None, 0
-
-    dados = (
-        base.groupby("_COLAB_")["_QTD_"]
-        .sum()
-        .reset_index()
-        .rename(columns={"_COLAB_": "Colaborador", "_QTD_": "Notas"})
-        .sort_values("Notas", ascending=False)
-    )
-
-    total = int(dados["Notas"].sum())
-
-    fig = px.pie(
-        dados,
-        names="Colaborador",
-        values="Notas",
-        hole=0.65,
-        template="plotly_white"
-    )
-    fig.update_layout(
-        height=320,
-        margin=dict(l=10, r=10, t=55, b=10),
-        legend_title_text="",
-        title=f"NOTAS ATENDIDAS POR COLABORADOR - {ano_ref if ano_ref else ''}".strip()
-    )
-    fig.update_traces(textinfo="value")
-
-    fig.add_annotation(
-        x=0.5, y=0.5, xref="paper", yref="paper",
-        text=f"<b>{fmt_int(total)}</b><br><span style='font-size:11px'>TOTAL</span>",
-        showarrow=False
-    )
-
-    return fig, total
 
 
 # ======================================================
@@ -445,6 +386,8 @@ def tela_login():
                 and st.session_state.get("login_senha") == st.secrets["auth"]["senha"]
             ):
                 st.session_state["logado"] = True
+                # o widget some depois do login: guarda o usuário para o painel de debug
+                st.session_state["usuario"] = st.session_state.get("login_usuario")
                 st.rerun()
             else:
                 st.error("Usuário ou senha inválidos")
@@ -462,6 +405,37 @@ if not st.session_state["logado"]:
     tela_login()
     st.stop()
 
+def usuario_admin() -> bool:
+    try:
+        admins = st.secrets["auth"].get("admins", [])
+    except Exception:
+        return False
+    return st.session_state.get("usuario") in admins
+
+# tempos / linhas / memória por etapa deste rerun (painel admin + metricas.jsonl)
+med = MedidorRerun()
+
+def painel_debug():
+    med.gravar({"usuario": st.session_state.get("usuario"), "base": info_base.get("hash"), "cache": info_base.get("status")})
+
+    if not usuario_admin():
+        return
+    with st.expander("🛠️ Debug — tempos por etapa (admin)", expanded=False):
+        _mem = st.toggle(
+            "Medir memória (tracemalloc — deixa o app mais lento para todos)",
+            value=memoria_ativa(),
+            key="debug_memoria",
+        )
+        if _mem != memoria_ativa():
+            ativar_memoria(_mem)
+
+        _regs = med.registros()
+        st.dataframe(
+            pd.DataFrame(_regs).set_index("etapa") if _regs else pd.DataFrame(),
+            use_container_width=True,
+        )
+        st.caption(f"Rerun: {med.total_ms():.0f} ms • base {info_base.get('hash', '')[:10]} ({info_base.get('status', '').upper()}) • log: metricas.jsonl")
+
 
 # ======================================================
 # TOPO
@@ -483,13 +457,31 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# ======================================================
+# FONTES
+#   st.secrets: [[fontes]] com nome / url / aba (nome ou índice). Sem isso: base única.
+# ======================================================
+URL_BASE = "https://drive.google.com/uc?id=1VadynN01W4mNRLfq8ABZAaQP8Sfim5tb"
+
+def fontes_configuradas() -> list[dict]:
+    try:
+        fontes = [dict(f) for f in st.secrets.get("fontes", [])]
+    except Exception:
+        fontes = []
+    return normalizar_fontes(fontes or [{"nome": "BASE", "url": URL_BASE, "aba": 0}])
+
+FONTES = fontes_configuradas()
+CHAVE_BASE = tuple((f["nome"], f["url"], str(f["aba"])) for f in FONTES)
+
+
 # ======================================================
 # ATUALIZAR BASE
 # ======================================================
 colA, colB = st.columns([1, 6])
 with colA:
     if st.button("🔄 Atualizar base"):
-        st.cache_data.clear()
+        # só estas fontes (as outras entradas e sessões não são afetadas)
+        cache_bases().invalidar(CHAVE_BASE)
         st.rerun()
 with colB:
     st.caption("Use quando atualizar o arquivo no Drive (XLSX).")
@@ -498,43 +490,107 @@ with colB:
 # ======================================================
 # CARREGAMENTO
 # ======================================================
-URL_BASE = "https://drive.google.com/uc?id=1VadynN01W4mNRLfq8ABZAaQP8Sfim5tb"
+ligar_renovacao(CHAVE_BASE, FONTES)
 
 try:
-    df = carregar_base(URL_BASE)
-    validar_estrutura_posicional(df)
+    with med.etapa("carregar_base") as _m:
+        df_raw, info_base = carregar_base(CHAVE_BASE, FONTES)
+        _m["linhas_out"] = len(df_raw)
+    validar_estrutura_posicional(df_raw)
 except Exception as e:
     st.error(str(e))
     st.stop()
 
+with colB:
+    _via = {"304": "não modificada (304)", "hash": "conteúdo idêntico", "download": "nova versão baixada"}
+    _leitura = info_base.get("leitura", {})
+    _fmt = str(_leitura.get("formato", "")).upper()
+    if _leitura.get("formato") == "csv":
+        _fmt += f" ({_leitura.get('encoding')}, sep {_leitura.get('sep')!r})"
+    st.caption(
+        f"Última verificação: {info_base['quando'].replace('T', ' ')} • "
+        f"{'HIT' if info_base['status'] == 'hit' else 'MISS'} — {_via.get(info_base['via'], info_base['via'])}"
+        + (f" • {_fmt}" if _fmt else "")
+        + (f" • {len(info_base['fontes'])} fontes" if len(info_base.get("fontes", [])) > 1 else "")
+    )
+    _ren = cache_bases().estado(CHAVE_BASE)
+    if _ren["erro_renovacao"]:
+        _quando = (_ren["ultima_renovacao"] or "").replace("T", " ")
+        st.caption(f"⚠️ Renovação automática falhou{f' ({_quando})' if _quando else ''}: mostrando a versão anterior.")
+
 
 # ======================================================
 # MAPEAMENTO FIXO (B/C/D/E/H)
+#   a leitura já entrega só essas colunas, com nomes fixos:
+#   NOTAS = B • TIPO = C • LOCAL = D • DATA = E • COLAB = H (+ RESULTADO, se houver)
 # ======================================================
-COL_NOTAS = df.columns[1]   # B
-COL_TIPO  = df.columns[2]   # C
-COL_LOCAL = df.columns[3]   # D
-COL_DATA  = df.columns[4]   # E
-COL_COLAB = df.columns[7]   # H
+with med.etapa("normalizacao", linhas_in=len(df_raw)) as _m:
+    estado_base = base_preparada(CHAVE_BASE, info_base["hash"], df_raw)
 
-df = df.copy()
-df[COL_DATA] = pd.to_datetime(df[COL_DATA], errors="coerce", dayfirst=True)
-df = df.dropna(subset=[COL_DATA]).copy()
+    # data (dayfirst) + _COLAB_/_TIPO_/_LOCAL_ categóricos + _ANO_/_SEMANA_/_DOW_ já calculados
+    df = estado_base["df"]
 
-df["_COLAB_"] = normalize_colab_series(df[COL_COLAB])
-df["_TIPO_"]  = df[COL_TIPO].astype(str).str.upper().str.strip()
-df["_LOCAL_"] = df[COL_LOCAL].astype(str).str.upper().str.strip()
-df["_NOTA_ID_"] = df[COL_NOTAS].astype(str).str.strip()
-df["_QTD_"] = 1
+    # contagens por (dia × colaborador × tipo × localidade): gráficos, totais e tabelas leem daqui
+    cubo = estado_base["cubo"]
+    _m["linhas_out"] = len(cubo)
 
-COL_RESULTADO = achar_coluna_por_nome(df, ["RESULTADO", "SITUA", "STATUS", "PARECER"])
-df["_RES_"] = df[COL_RESULTADO].astype(str).str.upper().str.strip() if COL_RESULTADO else ""
+_ing = estado_base["ingestao"]
+if _ing["modo"] == "incremental":
+    with colB:
+        st.caption(f"Ingestão incremental: {fmt_int(_ing['linhas_novas'])} linhas novas processadas.")
+
+
+# ======================================================
+# VISÃO: TORPEDO DA SEMANA | TENDÊNCIAS (vários anos)
+# ======================================================
+visao = st.segmented_control(
+    "Visão",
+    options=["Torpedo semanal", "Tendências"],
+    default=st.session_state.get("visao", "Torpedo semanal"),
+    key="visao",
+)
+
+if visao == "Tendências":
+    with med.etapa("tendencias", linhas_in=len(cubo)) as _m:
+        rollups = [
+            rollup_do_ano(ano, h, cubo.iloc[i:j])
+            for ano, (h, i, j) in versoes_anos(CHAVE_BASE, info_base["hash"], cubo).items()
+        ]
+
+        t1, t2, t3 = st.columns([1.0, 1.2, 3.8], gap="medium")
+        with t1:
+            gran = st.segmented_control("Granularidade", ["Semanal", "Mensal"], default="Semanal", key="tend_gran")
+        with t2:
+            dim_txt = st.segmented_control("Por", ["Colaborador", "Localidade"], default="Colaborador", key="tend_dim")
+        dim_txt = dim_txt or "Colaborador"
+        periodo = "_MES_" if gran == "Mensal" else "_SEG_"
+        dim = "_LOCAL_" if dim_txt == "Localidade" else "_COLAB_"
+
+        serie_total = serie_tendencia(rollups, periodo, dim)
+        ranking = serie_total.groupby(dim)["_QTD_"].sum().sort_values(ascending=False).index.tolist()
+        with t3:
+            itens = st.multiselect(dim_txt, options=ranking, default=ranking[:8], key=f"tend_itens{dim}")
+        serie = serie_total[serie_total[dim].isin(itens)] if itens else serie_total
+        _m["linhas_out"] = len(serie)
+
+    st.markdown(f'<div class="card"><div class="card-title">TENDÊNCIA {"MENSAL" if gran == "Mensal" else "SEMANAL"} — POR {dim_txt.upper()}</div>', unsafe_allow_html=True)
+    if serie.empty:
+        st.info("Sem dados para a tendência.")
+    else:
+        st.plotly_chart(figura_tendencia(serie, periodo, dim, dim_txt), use_container_width=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    painel_debug()
+    st.stop()
 
 
 # ======================================================
 # SELETORES (Ano • Período • Calendário • Semana)
 # ======================================================
-anos_disponiveis = sorted(df[COL_DATA].dropna().dt.year.unique().astype(int).tolist())
+# consultas sobre o cubo (ordenado por _DIA_): recortes por busca binária, filtros só no recorte,
+# e cada consumidor materializa apenas as colunas que usa
+q_cubo = ConsultaBase(cubo, "_DIA_")
+anos_disponiveis = [int(a) for a in q_cubo.unicos("_ANO_")]
 c_sel1, c_sel2, c_sel3, c_sel4 = st.columns([1.0, 1.3, 2.2, 2.0], gap="medium")
 
 with c_sel1:
@@ -552,12 +608,13 @@ with c_sel2:
         key="modo_periodo",
     )
 
-df_ano = df if (ano_sel is None) else df[df[COL_DATA].dt.year == int(ano_sel)].copy()
+q_ano = q_cubo if (ano_sel is None) else q_cubo.ano(ano_sel)
 ano_txt = str(ano_sel) if ano_sel else "—"
 
-if not df_ano.empty and df_ano[COL_DATA].notna().any():
-    _min_d = df_ano[COL_DATA].min().date()
-    _max_d = df_ano[COL_DATA].max().date()
+_lim = q_ano.limites()
+if _lim is not None:
+    _min_d = _lim[0].date()
+    _max_d = _lim[1].date()
 else:
     _min_d = date.today()
     _max_d = date.today()
@@ -587,8 +644,8 @@ with c_sel3:
 
 with c_sel4:
     semana_sel = None
-    if modo_periodo == "Semanal" and (ano_sel is not None) and (not df_ano.empty):
-        semanas_disp = sorted(df_ano[COL_DATA].dropna().dt.isocalendar().week.unique().astype(int).tolist())
+    if modo_periodo == "Semanal" and (ano_sel is not None) and (_lim is not None):
+        semanas_disp = [int(w) for w in q_ano.unicos("_SEMANA_")]
         opcoes_sem = ["Todas"] + [f"S{w:02d}" for w in semanas_disp]
         semana_sel = st.selectbox("Semana (S01..S53)", opcoes_sem, index=0, key="semana_sel")
     else:
@@ -603,19 +660,17 @@ if modo_periodo == "Semanal" and semana_sel and semana_sel != "Todas" and (ano_s
     except ValueError:
         st.warning("Semana inválida para este ano (ISO). Usando o filtro por calendário.")
 
-df_periodo = df_ano.copy()
-if not df_periodo.empty and df_periodo[COL_DATA].notna().any():
-    _dini = pd.to_datetime(data_ini)
-    _dfim = pd.to_datetime(data_fim) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
-    df_periodo = df_periodo[(df_periodo[COL_DATA] >= _dini) & (df_periodo[COL_DATA] <= _dfim)].copy()
+with med.etapa("filtros", linhas_in=len(cubo)):
+    q_periodo = q_ano.entre(data_ini, data_fim)
 
 
 # ======================================================
 # FILTROS (Localidade à esquerda | Tipo + Controles à direita)
 #   ✅ ALTERAÇÃO PEDIDA: Tipo de nota = segmented igual Localidade e fica perto dos controles
 # ======================================================
-locais = sorted([x for x in df_periodo["_LOCAL_"].dropna().unique().tolist() if str(x).strip()])
-tipos  = sorted([x for x in df_periodo["_TIPO_"].dropna().unique().tolist() if str(x).strip()])
+with med.etapa("filtros"):
+    locais = [x for x in q_periodo.categorias("_LOCAL_") if str(x).strip()]
+    tipos  = [x for x in q_periodo.categorias("_TIPO_") if str(x).strip()]
 
 op_local_tabs = ["TOTAL"] + locais
 op_tipo_tabs  = ["TOTAL"] + tipos
@@ -644,15 +699,13 @@ with c_right:
     )
     st.markdown("</div>", unsafe_allow_html=True)
 
-    st.caption("Colaboradores (para o gráfico) / Visual")
-    ctrl_box = st.container()
-
 # aplica filtros (Localidade + Tipo)
-df_filtro = df_periodo.copy()
-if local_tab and local_tab != "TOTAL":
-    df_filtro = df_filtro[df_filtro["_LOCAL_"] == str(local_tab).upper().strip()]
-if tipo_tab and tipo_tab != "TOTAL":
-    df_filtro = df_filtro[df_filtro["_TIPO_"] == str(tipo_tab).upper().strip()]
+with med.etapa("filtros"):
+    q_filtro = q_periodo
+    if local_tab and local_tab != "TOTAL":
+        q_filtro = q_filtro.onde("_LOCAL_", str(local_tab).upper().strip())
+    if tipo_tab and tipo_tab != "TOTAL":
+        q_filtro = q_filtro.onde("_TIPO_", str(tipo_tab).upper().strip())
 
 
 # ======================================================
@@ -666,15 +719,41 @@ else:
     week_start = pd.to_datetime(data_ini)
     week_end = pd.to_datetime(data_fim)
 
-df_semana = df_filtro[(df_filtro[COL_DATA] >= week_start) & (df_filtro[COL_DATA] <= week_end)].copy()
-df_semana["DOW_NUM"] = df_semana[COL_DATA].dt.weekday
-df_semana["DOW"] = df_semana["DOW_NUM"].map(DOW_PT)
-df_semana = df_semana[df_semana["DOW_NUM"].between(0, 4)].copy()
+with med.etapa("filtros") as _m:
+    if modo_periodo == "Semanal":
+        _iso = mon.isocalendar()
+        q_semana = q_filtro.semana_iso(_iso[0], _iso[1], dias=5)
+    else:
+        q_semana = q_filtro.entre(week_start, week_end)
+    q_semana = q_semana.ate("_DOW_", 4)
+    semana_vazia = q_semana.vazia()
+
+    total_periodo = q_semana.soma("_QTD_")
+    total_ano = q_filtro.ano(ano_sel).soma("_QTD_") if ano_sel else q_filtro.soma("_QTD_")
 
-total_periodo = int(df_semana["_QTD_"].sum())
-total_ano = int(df_filtro[df_filtro[COL_DATA].dt.year == int(ano_sel)]["_QTD_"].sum()) if ano_sel else int(df_filtro["_QTD_"].sum())
+    colabs_disp = q_semana.categorias("_COLAB_") if not semana_vazia else []
+    _m["linhas_out"] = len(q_semana)
+
+# ======================================================
+# SEÇÕES REEXECUTÁVEIS (st.fragment)
+#   um widget dentro de um fragmento reexecuta só o fragmento; as entradas vindas da
+#   rodada completa (consultas, semana, totais) chegam como argumentos
+# ======================================================
+def medidor_secao() -> MedidorRerun:
+    # rodada completa: etapas vão pro medidor global; rerun só do fragmento: medidor próprio
+    return med if not med.gravado else MedidorRerun()
+
+def gravar_medidor_secao(m: MedidorRerun, secao: str):
+    if m is not med:
+        m.gravar({"usuario": st.session_state.get("usuario"), "base": info_base.get("hash"), "fragmento": secao})
+
+def recorte_grafico(q_semana: ConsultaBase) -> ConsultaBase:
+    # colaboradores escolhidos no gráfico (lidos do session_state: valem para barras e notas)
+    sel = st.session_state.get("colabs_graf") or []
+    if not sel:
+        return q_semana
+    return q_semana.onde("_COLAB_", [str(x).upper().strip() for x in sel])
 
-colabs_disp = sorted(normalize_colab_series(df_semana["_COLAB_"]).dropna().unique().tolist()) if not df_semana.empty else []
 
 # ======================================================
 # CONTROLES DO GRÁFICO
@@ -688,16 +767,66 @@ if "modo_barra" not in st.session_state:
 
 st.session_state["colabs_graf"] = [c for c in st.session_state["colabs_graf"] if c in colabs_disp]
 
-with ctrl_box:
-    if df_semana.empty:
-        st.info("Sem dados no período.")
-    else:
-        st.multiselect(
-            "Colaboradores (para o gráfico)",
-            options=colabs_disp,
-            default=st.session_state["colabs_graf"],
-            key="colabs_graf",
-        )
+
+# ======================================================
+# DRILL-DOWN: NOTAS DA SELEÇÃO (paginado no servidor)
+# ======================================================
+COLUNAS_NOTAS = {
+    "DATA": "Data", "_NOTA_ID_": "Nota", "_COLAB_": "Colaborador",
+    "_TIPO_": "Tipo", "_LOCAL_": "Localidade", "_RES_": "Resultado", "_FONTE_": "Fonte",
+}
+
+# depende de: q_semana + df (rodada completa) • colabs_graf (seção de barras, que a contém)
+# • busca/ordem/página (próprios)
+@st.fragment
+def secao_notas(q_semana: ConsultaBase, df: pd.DataFrame):
+    m = medidor_secao()
+    with st.expander("🔎 Notas da seleção (período • filtros • colaboradores do gráfico)", expanded=False):
+        # mesmo recorte dos gráficos, refeito sobre a base linha a linha; só a página vai pro navegador
+        q_notas = recorte_grafico(q_semana).sobre(df)
+
+        d1, d2, d3, d4 = st.columns([2.4, 1.4, 0.9, 0.9], gap="small")
+        with d1:
+            busca = st.text_input("Buscar (nota, colaborador, localidade, tipo, resultado, fonte)", key="drill_busca")
+        with d2:
+            ordem_txt = st.selectbox("Ordenar por", list(COLUNAS_NOTAS.values()), key="drill_ordem")
+        with d3:
+            desc = st.toggle("Decrescente", key="drill_desc")
+        with d4:
+            tam_pag = st.selectbox("Por página", [25, 50, 100, 200], key="drill_tam")
+
+        with m.etapa("drill_down") as _m:
+            q_notas = q_notas.contem(["_NOTA_ID_", "_COLAB_", "_LOCAL_", "_TIPO_", "_RES_", "_FONTE_"], busca)
+            n_notas = len(q_notas)
+            n_pags = max(1, -(-n_notas // tam_pag))
+
+            if st.session_state.get("drill_pag", 1) > n_pags:
+                st.session_state["drill_pag"] = 1
+            pag = st.number_input(f"Página (1–{n_pags})", min_value=1, max_value=n_pags, value=1, step=1, key="drill_pag")
+            ordem_col = {v: k for k, v in COLUNAS_NOTAS.items()}[ordem_txt]
+            pagina = q_notas.pagina(pag, tam_pag, list(COLUNAS_NOTAS), ordem=ordem_col, desc=desc)
+            _m["linhas_in"] = n_notas
+            _m["linhas_out"] = len(pagina)
+
+        if n_notas == 0:
+            st.info("Nenhuma nota para a seleção atual.")
+        else:
+            st.dataframe(
+                pagina.rename(columns=COLUNAS_NOTAS),
+                hide_index=True,
+                use_container_width=True,
+                column_config={"Data": st.column_config.DateColumn(format="DD/MM/YYYY")},
+            )
+            _ini = (pag - 1) * tam_pag
+            st.caption(f"{fmt_int(_ini + 1)}–{fmt_int(_ini + len(pagina))} de {fmt_int(n_notas)} notas")
+    gravar_medidor_secao(m, "notas")
+
+# depende de: q_semana + colabs_disp (seção de barras) • modo_barra (próprio)
+@st.fragment
+def grafico_barras(q_semana: ConsultaBase, colabs_disp: list[str]):
+    m = medidor_secao()
+    _, k2 = st.columns([3.0, 1.2], gap="small")
+    with k2:
         st.selectbox(
             "Visual",
             ["Lado a lado", "Empilhado"],
@@ -705,75 +834,58 @@ with ctrl_box:
             key="modo_barra",
         )
 
+    colabs_sel = st.session_state.get("colabs_graf") or []
+    modo_barra = st.session_state.get("modo_barra", "Lado a lado")
 
-# ======================================================
-# LINHA PRINCIPAL: BARRAS + DONUT + RESUMO
-# ======================================================
-row_main = st.columns([2.2, 1.3, 1.0], gap="medium")
+    with m.etapa("barras") as _m:
+        base = recorte_grafico(q_semana).coletar(["_DOW_", "_COLAB_", "_QTD_"])
+        _m["linhas_in"] = len(base)
 
-with row_main[0]:
+        tmp = agregar_barras_semana(base, colabs_sel if colabs_sel else colabs_disp)
+        barmode = "group" if modo_barra == "Lado a lado" else "stack"
+        fig_bar = figura_barras(tmp, barmode)
+        _m["linhas_out"] = len(tmp)
+
+    st.plotly_chart(fig_bar, use_container_width=True)
+    gravar_medidor_secao(m, "barras")
+
+# depende de: q_semana + colabs_disp + df (rodada completa) • colabs_graf (próprio)
+# colabs_graf recorta o gráfico e as notas: os dois ficam dentro deste fragmento, então mudar
+# a seleção reexecuta só eles; Visual e os controles das notas reexecutam só a própria parte
+@st.fragment
+def secao_barras(q_semana: ConsultaBase, colabs_disp: list[str], semana_vazia: bool, df: pd.DataFrame):
     st.markdown('<div class="card"><div class="card-title">PRODUTIVIDADE DIÁRIA — POR COLABORADOR (SEG–SEX)</div>', unsafe_allow_html=True)
 
-    if df_semana.empty:
+    if semana_vazia:
         st.info("Sem dados no período selecionado.")
-        st.markdown("</div>", unsafe_allow_html=True)
     else:
-        colabs_sel = st.session_state.get("colabs_graf", default_colabs)
-        modo_barra = st.session_state.get("modo_barra", "Lado a lado")
-
-        base = df_semana.copy()
-        if colabs_sel:
-            base = base[base["_COLAB_"].isin([str(x).upper().strip() for x in colabs_sel])].copy()
-
-        tmp = (
-            base.groupby(["DOW_NUM", "DOW", "_COLAB_"], as_index=False)["_QTD_"]
-            .sum()
-            .rename(columns={"_QTD_": "Notas"})
+        st.multiselect(
+            "Colaboradores (para o gráfico)",
+            options=colabs_disp,
+            default=st.session_state["colabs_graf"],
+            key="colabs_graf",
         )
+        grafico_barras(q_semana, colabs_disp)
 
-        dias_df = pd.DataFrame({"DOW_NUM":[0,1,2,3,4], "DOW":["SEG","TER","QUA","QUI","SEX"]})
-        col_df = pd.DataFrame({"_COLAB_": [str(x).upper().strip() for x in (colabs_sel if colabs_sel else colabs_disp)]})
-
-        grid = dias_df.assign(_k=1).merge(col_df.assign(_k=1), on="_k").drop(columns="_k")
-        tmp = grid.merge(tmp, on=["DOW_NUM","DOW","_COLAB_"], how="left").fillna({"Notas":0})
-        tmp["Notas"] = tmp["Notas"].astype(int)
-        tmp = tmp.sort_values(["DOW_NUM", "_COLAB_"])
+    st.markdown("</div>", unsafe_allow_html=True)
+    secao_notas(q_semana, df)
 
-        barmode = "group" if modo_barra == "Lado a lado" else "stack"
 
-        fig_bar = px.bar(
-            tmp,
-            x="DOW",
-            y="Notas",
-            color="_COLAB_",
-            barmode=barmode,
-            text="Notas",
-            template="plotly_white",
-            category_orders={"DOW": ["SEG","TER","QUA","QUI","SEX"]},
-        )
-        fig_bar.update_layout(
-            height=320,
-            margin=dict(l=10, r=10, t=10, b=10),
-            legend_title_text="Colaborador"
-        )
-        fig_bar.update_traces(textposition="outside", cliponaxis=False)
-
-        total_graf = int(tmp["Notas"].sum())
-        fig_bar.add_annotation(
-            xref="paper", yref="paper",
-            x=0.99, y=1.12,
-            text=f"<b>TOTAL SEMANAL: {fmt_int(total_graf)}</b>",
-            showarrow=False,
-            align="right"
-        )
+# ======================================================
+# LINHA PRINCIPAL: BARRAS + DONUT + RESUMO
+# ======================================================
+row_main = st.columns([2.2, 1.3, 1.0], gap="medium")
 
-        st.plotly_chart(fig_bar, use_container_width=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+with row_main[0]:
+    secao_barras(q_semana, colabs_disp, semana_vazia, df)
 
 with row_main[1]:
     st.markdown('<div class="card"><div class="card-title">ACUMULADO POR COLABORADOR</div>', unsafe_allow_html=True)
 
-    fig_donut, _total_donut = donut_colaborador_acumulado(df_filtro, int(ano_sel) if ano_sel else None)
+    with med.etapa("donut") as _m:
+        _base_donut = q_filtro.coletar(["_COLAB_", "_QTD_", "_ANO_"])
+        _m["linhas_in"] = len(_base_donut)
+        fig_donut, _total_donut = donut_colaborador_acumulado(_base_donut, int(ano_sel) if ano_sel else None)
     if fig_donut is None:
         st.info("Sem dados para o acumulado por colaborador.")
     else:
@@ -805,13 +917,22 @@ with row_main[2]:
 
 # ======================================================
 # DEMANDA MANUAL  ✅ (FIX: NÃO DUPLICA KEY COM 2 COLABS)
+#   guardada em SQLite (torpedo_demandas): sobrevive a reinícios e é a mesma para todos
 # ======================================================
-def tabela_para_colaborador_manual(nome_colab: str, week_start_ts: pd.Timestamp, slot: int) -> pd.DataFrame:
+# os 15 selectboxes ficam num st.form: mexer neles não dispara rerun; "Salvar" grava tudo de uma vez
+def _salvar_form_demandas(semana_key: str):
+    # compara com o valor exibido quando o form foi montado: só o que o usuário mexeu vai
+    # para o banco (não sobrescreve edições de outros usuários nos campos não tocados)
+    exibidas = st.session_state.get("demandas_form", {})
+    alteracoes = [
+        (slot, nome_colab, dia, st.session_state.get(key, "-"))
+        for key, (slot, nome_colab, dia, antes) in exibidas.items()
+        if st.session_state.get(key, "-") != antes
+    ]
+    st.session_state["demandas_gravadas"] = gravar_lote(semana_key, alteracoes)
+
+def tabela_para_colaborador_manual(nome_colab: str, week_start_ts: pd.Timestamp, slot: int, salvas: dict) -> pd.DataFrame:
     semana_key = week_start_ts.strftime("%Y-%m-%d")
-    key_base = f"demanda|{semana_key}|slot{slot}|{nome_colab}"
-
-    if "demanda_manual" not in st.session_state:
-        st.session_state["demanda_manual"] = {}
 
     dias = []
     for i in range(5):
@@ -819,19 +940,16 @@ def tabela_para_colaborador_manual(nome_colab: str, week_start_ts: pd.Timestamp,
         dow = ["SEG", "TER", "QUA", "QUI", "SEX"][i]
         dias.append((d, dow))
 
-    for d, _dow in dias:
-        k = f"{key_base}|{d.isoformat()}"
-        if k not in st.session_state["demanda_manual"]:
-            st.session_state["demanda_manual"][k] = "-"
-
     st.markdown(
         "<div style='text-align:left; font-weight:950; color:#0b2b45; margin: 4px 0 10px 0;'>"
         "Selecione a demanda por dia</div>",
         unsafe_allow_html=True
     )
 
+    opts = ["-"] + OPCOES_DEMANDA
+    escolhas = []
     for d, dow in dias:
-        k = f"{key_base}|{d.isoformat()}"
+        dia = d.isoformat()
         cA, cB = st.columns([1, 2.2], gap="small")
         with cA:
             st.markdown(
@@ -839,147 +957,169 @@ def tabela_para_colaborador_manual(nome_colab: str, week_start_ts: pd.Timestamp,
                 unsafe_allow_html=True
             )
         with cB:
-            opts = ["-"] + OPCOES_DEMANDA
-            atual = st.session_state["demanda_manual"].get(k, "-")
-            idx = opts.index(atual) if atual in opts else 0
-
-            escolha = st.selectbox(
-                label="",
-                options=opts,
-                index=idx,
-                key=f"sb_{semana_key}_slot{slot}_{d.isoformat()}"
-            )
-            st.session_state["demanda_manual"][k] = escolha
+            key = f"sb_{semana_key}_slot{slot}_{nome_colab}_{dia}"
+            # o banco manda (o "Salvar" grava antes do rerun)
+            atual = salvas.get((slot, nome_colab, dia), "-")
+            atual = atual if atual in opts else "-"
+            st.session_state[key] = atual
+            st.session_state["demandas_form"][key] = (slot, nome_colab, dia, atual)
 
-    rows = []
-    for d, dow in dias:
-        k = f"{key_base}|{d.isoformat()}"
-        rows.append({"Data": pd.to_datetime(d), "DOW": dow, "Demanda": st.session_state["demanda_manual"][k]})
+            escolhas.append(st.selectbox(label="", options=opts, key=key))
 
-    return pd.DataFrame(rows)
+    return pd.DataFrame({
+        "Data": pd.to_datetime([d for d, _ in dias]),
+        "DOW": [dow for _, dow in dias],
+        "Demanda": escolhas,
+    })
 
 
 # ======================================================
-# 3 TABELAS
+# DEMANDAS + PDF (fragmento)
+#   trocar colaborador das tabelas, salvar demandas ou pedir PDF reexecuta só esta parte
+#   depende de: q_filtro, q_semana, q_ano, semana e totais (rodada completa)
 # ======================================================
-st.markdown('<div class="card"><div class="card-title">DEMANDA DE APOIO (MANUAL)</div>', unsafe_allow_html=True)
+@st.fragment
+def secao_demandas(q_filtro: ConsultaBase, q_semana: ConsultaBase, q_ano: ConsultaBase, semana_vazia: bool,
+                   week_start: pd.Timestamp, week_end: pd.Timestamp, ano_sel, ano_txt: str,
+                   total_periodo: int, total_ano: int):
+    m = medidor_secao()
+    # ---------- 3 tabelas ----------
+    st.markdown('<div class="card"><div class="card-title">DEMANDA DE APOIO (MANUAL)</div>', unsafe_allow_html=True)
 
-if st.button("🧹 Limpar demandas desta semana"):
     semana_key = week_start.strftime("%Y-%m-%d")
-    if "demanda_manual" in st.session_state:
-        apagar = [k for k in list(st.session_state["demanda_manual"].keys()) if f"demanda|{semana_key}|" in k]
-        for k in apagar:
-            del st.session_state["demanda_manual"][k]
-    st.rerun()
-
-pessoas = sorted(normalize_colab_series(df_filtro["_COLAB_"]).dropna().unique().tolist())
-
-top3_tbl = []
-if not df_semana.empty:
-    top3_tbl = (
-        df_semana.dropna(subset=["_COLAB_"])
-        .groupby("_COLAB_")["_QTD_"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(3)
-        .index.tolist()
-    )
-if len(top3_tbl) < 3:
-    resto = [p for p in pessoas if p not in top3_tbl]
-    top3_tbl = (top3_tbl + resto)[:3]
+    if st.button("🧹 Limpar demandas desta semana"):
+        limpar_semana(semana_key)
+        st.rerun(scope="fragment")
 
-if not pessoas:
-    st.warning("Sem colaboradores na base para montar as tabelas.")
-    st.stop()
+    # 1 leitura indexada da semana exibida
+    demandas_semana = ler_semana(semana_key)
 
-while len(top3_tbl) < 3:
-    top3_tbl.append(pessoas[0])
+    pessoas = q_filtro.categorias("_COLAB_")
 
-def _safe_index(lst, val, fallback=0):
-    try:
-        return lst.index(val)
-    except ValueError:
-        return fallback
-
-s1, s2, s3 = st.columns(3, gap="large")
-with s1:
-    colab1 = st.selectbox("Tabela 1", options=pessoas, index=_safe_index(pessoas, top3_tbl[0]), key="t1")
-with s2:
-    colab2 = st.selectbox("Tabela 2", options=pessoas, index=_safe_index(pessoas, top3_tbl[1]), key="t2")
-with s3:
-    colab3 = st.selectbox("Tabela 3", options=pessoas, index=_safe_index(pessoas, top3_tbl[2]), key="t3")
-
-tcols = st.columns(3, gap="large")
-cores = ["head-blue", "head-green", "head-yellow"]
-selecionados = [colab1, colab2, colab3]
-
-rendered_tables = {}
-for i in range(3):
-    nome = selecionados[i]
-    slot = i + 1
-    with tcols[i]:
-        df_tbl = tabela_para_colaborador_manual(nome, week_start, slot)
-        rendered_tables[f"TABELA {slot} - {nome}"] = df_tbl
-        st.markdown(html_torpedo_table(f"DEMANDA DE APOIO – {nome}", cores[i], df_tbl), unsafe_allow_html=True)
-
-st.markdown("</div>", unsafe_allow_html=True)
-
-
-# ======================================================
-# PDF
-# ======================================================
-def gerar_pdf_torpedo(ano_ref, periodo_txt, total_periodo, total_ano, tabelas_dict):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-    styles = getSampleStyleSheet()
-    elementos = []
-
-    elementos.append(Paragraph(f"<b>TORPEDO SEMANAL – PRODUTIVIDADE ({ano_ref})</b>", styles["Title"]))
-    elementos.append(Spacer(1, 10))
-    elementos.append(Paragraph(f"<b>Período:</b> {periodo_txt}", styles["Normal"]))
-    elementos.append(Paragraph(f"<b>Total do período:</b> {total_periodo}", styles["Normal"]))
-    elementos.append(Paragraph(f"<b>Total no ano:</b> {total_ano}", styles["Normal"]))
-    elementos.append(Spacer(1, 12))
-
-    elementos.append(Paragraph("<b>Demandas (seg–sex)</b>", styles["Heading2"]))
-    elementos.append(Spacer(1, 6))
-
-    for nome, df_tbl in (tabelas_dict or {}).items():
-        elementos.append(Paragraph(f"<b>{nome}</b>", styles["Heading3"]))
-        data = [["Data", "Dia", "Demanda"]] + [
-            [pd.to_datetime(r["Data"]).strftime("%d/%m/%Y"), r["DOW"], r["Demanda"]]
-            for _, r in df_tbl.iterrows()
-        ]
-        t = Table(data, repeatRows=1, colWidths=[75, 35, 360])
-        t.setStyle(TableStyle([
-            ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-            ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
-            ("FONT", (0,0), (-1,0), "Helvetica-Bold"),
-            ("FONTSIZE", (0,0), (-1,-1), 8),
-            ("VALIGN", (0,0), (-1,-1), "TOP"),
-        ]))
-        elementos.append(t)
-        elementos.append(Spacer(1, 10))
-
-    doc.build(elementos)
-    buffer.seek(0)
-    return buffer
-
-periodo_txt_pdf = f"{week_start.strftime('%d/%m/%Y')} a {week_end.strftime('%d/%m/%Y')}"
-pdf_buffer = gerar_pdf_torpedo(
-    ano_ref=ano_txt,
-    periodo_txt=periodo_txt_pdf,
-    total_periodo=total_periodo,
-    total_ano=total_ano,
-    tabelas_dict=rendered_tables
-)
+    top3_tbl = [] if semana_vazia else top_colaboradores(q_semana, 3)
+    if len(top3_tbl) < 3:
+        resto = [p for p in pessoas if p not in top3_tbl]
+        top3_tbl = (top3_tbl + resto)[:3]
 
-st.download_button(
-    label="📄 Exportar PDF (Torpedo)",
-    data=pdf_buffer,
-    file_name=f"Torpedo_Semanal_{ano_txt}_{week_start.strftime('%Y%m%d')}.pdf",
-    mime="application/pdf"
-)
+    if not pessoas:
+        st.warning("Sem colaboradores na base para montar as tabelas.")
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    while len(top3_tbl) < 3:
+        top3_tbl.append(pessoas[0])
+
+    def _safe_index(lst, val, fallback=0):
+        try:
+            return lst.index(val)
+        except ValueError:
+            return fallback
+
+    s1, s2, s3 = st.columns(3, gap="large")
+    with s1:
+        colab1 = st.selectbox("Tabela 1", options=pessoas, index=_safe_index(pessoas, top3_tbl[0]), key="t1")
+    with s2:
+        colab2 = st.selectbox("Tabela 2", options=pessoas, index=_safe_index(pessoas, top3_tbl[1]), key="t2")
+    with s3:
+        colab3 = st.selectbox("Tabela 3", options=pessoas, index=_safe_index(pessoas, top3_tbl[2]), key="t3")
+
+    cores = ["head-blue", "head-green", "head-yellow"]
+    selecionados = [colab1, colab2, colab3]
+
+    rendered_tables = {}
+    st.session_state["demandas_form"] = {}
+    with st.form("form_demandas", border=False):
+        tcols = st.columns(3, gap="large")
+        for i in range(3):
+            nome = selecionados[i]
+            slot = i + 1
+            with tcols[i]:
+                df_tbl = tabela_para_colaborador_manual(nome, week_start, slot, demandas_semana)
+                rendered_tables[f"TABELA {slot} - {nome}"] = df_tbl
+                st.markdown(html_torpedo_table(f"DEMANDA DE APOIO – {nome}", cores[i], df_tbl), unsafe_allow_html=True)
+
+        st.form_submit_button("💾 Salvar demandas da semana", on_click=_salvar_form_demandas, args=(semana_key,))
+
+    _n_gravadas = st.session_state.pop("demandas_gravadas", None)
+    if _n_gravadas is not None:
+        st.caption(f"✅ {_n_gravadas} alteração(ões) salva(s)." if _n_gravadas else "Nenhuma alteração para salvar.")
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+    # ---------- pdf ----------
+    periodo_txt_pdf = f"{week_start.strftime('%d/%m/%Y')} a {week_end.strftime('%d/%m/%Y')}"
+    chave_pdf = (ano_txt, periodo_txt_pdf, int(total_periodo), int(total_ano), tabelas_para_tupla(rendered_tables))
+
+    # o PDF só é montado depois do clique; mudou filtro/tabela -> volta a pedir
+    if st.button("📄 Preparar PDF (Torpedo)"):
+        st.session_state["pdf_pedido"] = chave_pdf
+
+    if st.session_state.get("pdf_pedido") == chave_pdf:
+        with m.etapa("pdf", linhas_in=sum(len(t) for t in rendered_tables.values())):
+            pdf_bytes = pdf_torpedo_bytes(*chave_pdf)
+
+        st.download_button(
+            label="⬇️ Baixar PDF (Torpedo)",
+            data=pdf_bytes,
+            file_name=f"Torpedo_Semanal_{ano_txt}_{week_start.strftime('%Y%m%d')}.pdf",
+            mime="application/pdf"
+        )
+
+    # fechamento de mês/ano: vários torpedos de uma vez (mesmos filtros de Localidade/Tipo)
+    with st.expander("📦 Exportação em lote (PDF)", expanded=False):
+        semanas_lote = [int(w) for w in q_ano.unicos("_SEMANA_")] if ano_sel else []
+        if not semanas_lote:
+            st.info("Selecione um ano com dados para exportar em lote.")
+        else:
+            l1, l2 = st.columns([1.2, 2.8], gap="medium")
+            with l1:
+                modo_lote = st.radio("Gerar", ["1 PDF por semana", "1 PDF por colaborador"], key="lote_modo")
+            with l2:
+                if len(semanas_lote) > 1:
+                    sem_ini, sem_fim = st.select_slider(
+                        "Semanas",
+                        options=semanas_lote,
+                        value=(semanas_lote[0], semanas_lote[-1]),
+                        format_func=lambda w: f"S{w:02d}",
+                        key="lote_semanas",
+                    )
+                else:
+                    sem_ini = sem_fim = semanas_lote[0]
+                colabs_lote = None
+                if modo_lote == "1 PDF por colaborador":
+                    colabs_lote = st.multiselect(
+                        "Colaboradores (vazio = todos)",
+                        options=q_filtro.sem_datas().ano(int(ano_sel)).categorias("_COLAB_"),
+                        key="lote_colabs",
+                    ) or None
+
+            if st.button(f"Gerar lote ({LOTE_WORKERS} processos)", key="lote_gerar"):
+                tarefas = montar_tarefas(
+                    q_filtro, int(ano_sel), [w for w in semanas_lote if sem_ini <= w <= sem_fim],
+                    modo="semanas" if modo_lote == "1 PDF por semana" else "colaboradores",
+                    # segunda da semana ISO 1 pode cair em 29/12 do ano anterior
+                    demandas=ler_intervalo(f"{int(ano_sel) - 1}-12-29", f"{int(ano_sel)}-12-31"),
+                    colaboradores=colabs_lote,
+                )
+                if not tarefas:
+                    st.warning("Nenhuma semana com produção no intervalo escolhido.")
+                else:
+                    barra = st.progress(0.0, text=f"0/{len(tarefas)} PDFs")
+                    with m.etapa("pdf_lote", linhas_in=len(tarefas)):
+                        zip_bytes = exportar_lote(
+                            tarefas,
+                            progresso=lambda k, n: barra.progress(k / n, text=f"{k}/{n} PDFs"),
+                        )
+                    st.session_state["lote_zip"] = (f"Torpedos_{ano_sel}_S{sem_ini:02d}-S{sem_fim:02d}.zip", zip_bytes)
+
+            if "lote_zip" in st.session_state:
+                nome_zip, zip_bytes = st.session_state["lote_zip"]
+                st.download_button("⬇️ Baixar lote (ZIP)", data=zip_bytes, file_name=nome_zip, mime="application/zip")
+
+    gravar_medidor_secao(m, "demandas")
+
+secao_demandas(q_filtro, q_semana, q_ano, semana_vazia, week_start, week_end, ano_sel, ano_txt, total_periodo, total_ano)
 
 
 # ======================================================
@@ -1015,3 +1155,9 @@ components.html(
     """,
     height=0
 )
+
+
+# ======================================================
+# DEBUG (admin): tempos por etapa deste rerun
+# ======================================================
+painel_debug()
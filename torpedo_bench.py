@@ -0,0 +1,249 @@
+# ======================================================
+# BENCHMARK DAS ETAPAS DO DASHBOARD (bases sintéticas B/C/D/E/H)
+#
+#   python torpedo_bench.py
+#   python torpedo_bench.py --tamanhos 10000 100000 1000000 5000000 --formatos csv
+#   python torpedo_bench.py --tamanhos 50000 --json bench.json
+#
+# Tempo = 1 execução sem rastreio. Memória = pico do tracemalloc numa 2ª execução
+# (numpy/pandas aparecem; buffers internos do Arrow não). Os caches em memória de figuras
+# e fragmentos HTML são limpos antes de cada execução (--com-cache mede com eles quentes).
+# ======================================================
+import gc, sys, json, time, argparse, tempfile, tracemalloc
+from io import BytesIO, StringIO
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+import torpedo_dados
+import torpedo_tabelas
+import torpedo_visuais
+from torpedo_dados import (
+    ler_base_bytes, preparar_base, montar_cubo, ConsultaBase,
+    hash_conteudo, gravar_snapshot, ler_snapshot, COL_DATA,
+)
+from torpedo_visuais import (
+    html_torpedo_table, donut_colaborador_acumulado,
+    agregar_barras_semana, figura_barras, gerar_pdf_torpedo,
+)
+
+
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000]
+
+TIPOS = ["INSPEÇÃO", "VERIFICAÇÃO", "REPARO", "INSTALAÇÃO", "LAUDO", "VISTORIA"]
+RESULTADOS = ["APROVADO", "REPROVADO", "PENDENTE", "CANCELADO"]
+DEMANDAS = ["-", "BAIXA DE LAUDO", "ANEXO DE AR", "DIGITALIZAÇÃO DE AR", "RENOMEAÇÃO DE AR"]
+
+
+# ======================================================
+# BASE SINTÉTICA
+# ======================================================
+def gerar_base_sintetica(n: int, seed: int = 42, anos: int = 3, n_colabs: int = 60,
+                         n_locais: int = 40, extras: int = 12) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    fim = pd.Timestamp(date.today())
+    dias = pd.bdate_range(fim - pd.DateOffset(years=anos), fim)
+    # base "append-mostly": datas quase em ordem, como no Drive
+    datas = np.sort(dias.to_numpy()[rng.integers(0, len(dias), n)])
+
+    colabs = np.array([f"Colaborador {i:03d}" for i in range(n_colabs)], dtype=object)
+    colab = colabs[rng.integers(0, n_colabs, n)]
+    # sujeira típica: caixa/espaços diferentes e células vazias
+    sujos = rng.random(n)
+    colab = np.where(sujos < 0.05, np.char.add(colab.astype(str), " "), colab).astype(object)
+    colab = np.where(sujos > 0.98, None, colab)
+
+    df = pd.DataFrame({
+        "ID": np.arange(1, n + 1),                                    # A
+        "NOTA": (10_000_000 + np.arange(n)).astype(str),              # B
+        "TIPO": rng.choice(TIPOS, n),                                 # C
+        "LOCALIDADE": [f"MUNICÍPIO {i:02d}" for i in rng.integers(0, n_locais, n)],  # D
+        "DATA BAIXA": datas,                                          # E
+        "RESULTADO": rng.choice(RESULTADOS, n),                       # F
+        "OBS": "",                                                    # G
+        "COLABORADOR": colab,                                         # H
+    })
+    # export "largo": colunas que o dashboard não usa
+    for k in range(extras):
+        df[f"EXTRA {k + 1:02d}"] = rng.integers(0, 1000, n)
+    return df
+
+def base_para_csv(df: pd.DataFrame) -> bytes:
+    buf = StringIO()
+    df.to_csv(buf, sep=";", index=False, date_format="%d/%m/%Y")
+    return buf.getvalue().encode("utf-8")
+
+def base_para_xlsx(df: pd.DataFrame) -> bytes:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for linha in df.itertuples(index=False, name=None):
+        ws.append([None if v is None else v for v in linha])
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+# ======================================================
+# MEDIÇÃO
+# ======================================================
+# sem isso a 2ª execução (tracemalloc) de donut/barras/html_tabela mede só um acerto de cache
+def limpar_caches_memoria():
+    torpedo_visuais._figuras.limpar()
+    torpedo_tabelas._fragmentos.limpar()
+
+def medir(func, *args, memoria: bool = True, com_cache: bool = False):
+    gc.collect()
+    if not com_cache:
+        limpar_caches_memoria()
+    t0 = time.perf_counter()
+    saida = func(*args)
+    tempo = time.perf_counter() - t0
+
+    pico = None
+    if memoria:
+        gc.collect()
+        if not com_cache:
+            limpar_caches_memoria()
+        tracemalloc.start()
+        func(*args)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return saida, tempo, pico
+
+def _linhas(obj) -> int | None:
+    if isinstance(obj, tuple):
+        obj = obj[0]
+    if isinstance(obj, pd.DataFrame):
+        return len(obj)
+    return None
+
+
+# ======================================================
+# ETAPAS
+# ======================================================
+def _tabela_manual(week_start: pd.Timestamp, rng) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Data": [week_start + pd.Timedelta(days=i) for i in range(5)],
+        "DOW": ["SEG", "TER", "QUA", "QUI", "SEX"],
+        "Demanda": rng.choice(DEMANDAS, 5),
+    })
+
+def rodar_tamanho(n: int, formatos: list[str], max_xlsx: int, memoria: bool, com_cache: bool = False) -> list[dict]:
+    resultados = []
+
+    def registrar(etapa, func, *args, linhas_in=None):
+        saida, tempo, pico = medir(func, *args, memoria=memoria, com_cache=com_cache)
+        resultados.append({
+            "tamanho": n,
+            "etapa": etapa,
+            "linhas_in": linhas_in,
+            "linhas_out": _linhas(saida),
+            "tempo_s": round(tempo, 4),
+            "pico_mb": None if pico is None else round(pico / 2**20, 1),
+        })
+        return saida
+
+    sintetica = gerar_base_sintetica(n)
+    df_raw = None
+
+    for fmt in formatos:
+        if fmt == "xlsx" and n > max_xlsx:
+            print(f"  [{n}] xlsx ignorado (> --max-xlsx {max_xlsx})", file=sys.stderr)
+            continue
+        raw = base_para_xlsx(sintetica) if fmt == "xlsx" else base_para_csv(sintetica)
+        df_raw, _leitura = registrar(f"leitura_{fmt}", ler_base_bytes, raw, linhas_in=n)
+
+        chave = hash_conteudo(raw)
+        registrar("snapshot_gravar", gravar_snapshot, chave, df_raw, linhas_in=len(df_raw))
+        registrar("snapshot_ler", ler_snapshot, chave, linhas_in=len(df_raw))
+
+    if df_raw is None:
+        return resultados
+
+    df = registrar("preparar_base", preparar_base, df_raw, linhas_in=len(df_raw))
+    cubo = registrar("montar_cubo", montar_cubo, df, linhas_in=len(df))
+
+    q = ConsultaBase(cubo, "_DIA_")
+    ano = int(q.unicos("_ANO_")[-1])
+    q_ano = q.ano(ano)
+    registrar(
+        "donut",
+        lambda: donut_colaborador_acumulado(q_ano.coletar(["_COLAB_", "_QTD_", "_ANO_"]), ano),
+        linhas_in=len(q_ano),
+    )
+
+    ultimo = q_ano.limites()[1]
+    seg = ultimo - pd.Timedelta(days=ultimo.weekday())
+    iso = seg.isocalendar()
+    q_sem = q.semana_iso(iso[0], iso[1], dias=5)
+    colabs = q_sem.categorias("_COLAB_")[:6]
+    registrar(
+        "barras",
+        lambda: figura_barras(agregar_barras_semana(q_sem.coletar(["_DOW_", "_COLAB_", "_QTD_"]), colabs), "group"),
+        linhas_in=len(q_sem),
+    )
+
+    rng = np.random.default_rng(7)
+    # tabela "grande" (listagem completa) além das 3 tabelas de 5 dias do torpedo
+    listagem = pd.DataFrame({
+        "Data": df[COL_DATA].iloc[: min(len(df), 50_000)].to_numpy(),
+        "DOW": "SEG",
+        "Demanda": rng.choice(DEMANDAS, min(len(df), 50_000)),
+    })
+    registrar("html_tabela", html_torpedo_table, "LISTAGEM", "head-blue", listagem, linhas_in=len(listagem))
+
+    tabelas = {f"TABELA {i} - {c}": _tabela_manual(seg, rng) for i, c in enumerate(colabs[:3], start=1)}
+    registrar(
+        "pdf",
+        gerar_pdf_torpedo, str(ano), f"{seg:%d/%m/%Y}", int(q_sem.soma()), int(q_ano.soma()), tabelas,
+        linhas_in=sum(len(t) for t in tabelas.values()),
+    )
+    return resultados
+
+
+# ======================================================
+# CLI
+# ======================================================
+def _imprimir(resultados: list[dict]):
+    cab = f"{'tamanho':>9}  {'etapa':<16} {'linhas_in':>10} {'linhas_out':>10} {'tempo_s':>9} {'pico_mb':>9}"
+    print(cab)
+    print("-" * len(cab))
+    for r in resultados:
+        print(
+            f"{r['tamanho']:>9}  {r['etapa']:<16} "
+            f"{'' if r['linhas_in'] is None else r['linhas_in']:>10} "
+            f"{'' if r['linhas_out'] is None else r['linhas_out']:>10} "
+            f"{r['tempo_s']:>9.3f} "
+            f"{'' if r['pico_mb'] is None else r['pico_mb']:>9}"
+        )
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark das etapas do Torpedo Semanal com bases sintéticas.")
+    ap.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    ap.add_argument("--formatos", nargs="+", choices=["xlsx", "csv"], default=["xlsx", "csv"])
+    ap.add_argument("--max-xlsx", type=int, default=200_000, help="não gera XLSX acima deste tamanho (lento de escrever)")
+    ap.add_argument("--sem-memoria", action="store_true", help="pula a 2ª execução com tracemalloc")
+    ap.add_argument("--com-cache", action="store_true", help="não limpa os caches de figuras/HTML entre execuções")
+    ap.add_argument("--json", help="grava os resultados neste arquivo")
+    args = ap.parse_args(argv)
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # snapshots do benchmark não se misturam com o cache do app
+        torpedo_dados.CACHE_DIR = tmp
+        for n in args.tamanhos:
+            print(f"→ {n} linhas...", file=sys.stderr)
+            resultados += rodar_tamanho(n, args.formatos, args.max_xlsx, not args.sem_memoria, args.com_cache)
+
+    _imprimir(resultados)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
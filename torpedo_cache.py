@@ -0,0 +1,200 @@
+import time, hashlib, threading
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import Future
+
+import pandas as pd
+
+
+# ======================================================
+# LRU EM MEMÓRIA (fragmentos HTML, figuras) + hash de conteúdo de DataFrame
+# ======================================================
+def hash_frame(df: pd.DataFrame, *extra) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    h.update("|".join(map(str, (*df.columns, *extra))).encode("utf-8"))
+    return h.hexdigest()
+
+class CacheLRU:
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._itens: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: str, montar):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+        valor = montar()
+        with self._lock:
+            self._itens[chave] = valor
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+# ======================================================
+# CACHE POR CHAVE (URL) COM CARGA COALESCIDA
+# ======================================================
+class CacheCoalescido:
+    # Uma entrada por chave (ex.: URL da base) com TTL. Quem pede uma chave fria enquanto a
+    # carga já está em andamento espera essa mesma carga: 1 download/parse, não 1 por sessão.
+    # Derivados (base preparada, versões por ano...) ficam presos à chave e à versão dos dados.
+    def __init__(self, ttl: float | None = None, versao=None):
+        self.ttl = ttl
+        self.versao = versao or (lambda valor: None)
+        self._lock = threading.Lock()
+        self._entradas: dict = {}    # chave -> {"valor", "criado"}
+        self._derivados: dict = {}   # chave -> {(nome, versao): valor}
+        self._em_voo: dict = {}      # id da carga -> Future
+        self._renovacoes: dict = {}  # chave -> {"carregar", "depois", "erro", "ultima"}
+        self._thread = None
+        self._parar = threading.Event()
+
+    def _vencida(self, entrada: dict, folga: float = 0.0) -> bool:
+        return self.ttl is not None and (time.monotonic() - entrada["criado"]) > self.ttl - folga
+
+    def _coalescer(self, id_voo, calcular, guardar):
+        with self._lock:
+            fut = self._em_voo.get(id_voo)
+            dono = fut is None
+            if dono:
+                fut = self._em_voo[id_voo] = Future()
+        if not dono:
+            return fut.result()
+
+        try:
+            valor = calcular()
+            with self._lock:
+                guardar(valor)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(valor)
+            return valor
+        finally:
+            with self._lock:
+                self._em_voo.pop(id_voo, None)
+
+    def _guardar_base(self, chave, valor):
+        # chamado com o lock: base nova e derivados da versão antiga trocam juntos
+        self._entradas[chave] = {"valor": valor, "criado": time.monotonic()}
+        v = self.versao(valor)
+        self._derivados[chave] = {k: d for k, d in self._derivados.get(chave, {}).items() if k[1] == v}
+
+    # ---------- base ----------
+    def pronto(self, chave) -> bool:
+        with self._lock:
+            e = self._entradas.get(chave)
+            return e is not None and (not self._vencida(e) or chave in self._renovacoes)
+
+    def obter(self, chave, carregar):
+        with self._lock:
+            e = self._entradas.get(chave)
+            if e is not None and not self._vencida(e):
+                return e["valor"]
+            # stale-while-revalidate: com renovação agendada, entrega a versão atual e
+            # recarrega em segundo plano (o usuário não espera o download)
+            if e is not None and chave in self._renovacoes:
+                disparar = ("base", chave) not in self._em_voo
+                valor = e["valor"]
+            else:
+                disparar = None
+        if disparar is not None:
+            if disparar:
+                threading.Thread(target=self._renovar, args=(chave,), daemon=True).start()
+            return valor
+
+        return self._coalescer(("base", chave), carregar, lambda v: self._guardar_base(chave, v))
+
+    # ---------- derivados ----------
+    def derivado(self, chave, nome: str, versao, calcular):
+        with self._lock:
+            d = self._derivados.get(chave, {})
+            if (nome, versao) in d:
+                return d[(nome, versao)]
+
+        def guardar(valor):
+            self._derivados.setdefault(chave, {})[(nome, versao)] = valor
+
+        return self._coalescer(("derivado", chave, nome, versao), calcular, guardar)
+
+    # ---------- invalidação ----------
+    def invalidar(self, chave, derivados: bool = False):
+        # só esta chave (as demais bases seguem valendo). Por padrão os derivados ficam:
+        # se a recarga trouxer a mesma versão eles são reaproveitados, senão caem na troca
+        with self._lock:
+            self._entradas.pop(chave, None)
+            if derivados:
+                self._derivados.pop(chave, None)
+
+    # ---------- renovação em segundo plano ----------
+    # carregar() e depois(valor) rodam fora do script do Streamlit: nada de st.* neles.
+    # depois() prepara os derivados da versão nova ANTES da troca; até lá os usuários
+    # continuam vendo a versão anterior.
+    def agendar_renovacao(self, chave, carregar, depois=None, antecedencia: float = 60, intervalo: float = 15):
+        with self._lock:
+            r = self._renovacoes.setdefault(chave, {"erro": None, "ultima": None})
+            r["carregar"], r["depois"] = carregar, depois
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._laco, args=(antecedencia, intervalo), name="torpedo-renovacao", daemon=True,
+                )
+                self._thread.start()
+
+    def _laco(self, antecedencia: float, intervalo: float):
+        while not self._parar.wait(intervalo):
+            for chave in list(self._renovacoes):
+                with self._lock:
+                    e = self._entradas.get(chave)
+                    devida = e is None or self._vencida(e, folga=antecedencia)
+                    ocupada = ("base", chave) in self._em_voo
+                if devida and not ocupada:
+                    self._renovar(chave)
+
+    def _renovar(self, chave):
+        with self._lock:
+            r = self._renovacoes.get(chave)
+        if r is None:
+            return
+
+        def carregar_e_preparar():
+            valor = r["carregar"]()
+            if r["depois"]:
+                r["depois"](valor)
+            return valor
+
+        try:
+            self._coalescer(("base", chave), carregar_e_preparar, lambda v: self._guardar_base(chave, v))
+            erro = None
+        except Exception as e:
+            # falhou: segue servindo a versão anterior; tenta de novo na próxima volta
+            erro = str(e)
+        # erro e horário trocam juntos: estado() nunca vê um sem o outro
+        with self._lock:
+            r["erro"], r["ultima"] = erro, datetime.now().isoformat(timespec="seconds")
+
+    def parar(self):
+        self._parar.set()
+
+    def estado(self, chave) -> dict:
+        with self._lock:
+            e = self._entradas.get(chave)
+            r = self._renovacoes.get(chave, {})
+            return {
+                "idade_s": None if e is None else round(time.monotonic() - e["criado"], 1),
+                "carregando": ("base", chave) in self._em_voo,
+                "derivados": sorted({k[0] for k in self._derivados.get(chave, {})}),
+                "renovacao": chave in self._renovacoes,
+                "ultima_renovacao": r.get("ultima"),
+                "erro_renovacao": r.get("erro"),
+            }
@@ -0,0 +1,957 @@
+import os, re, csv, json, codecs, hashlib, tempfile, threading
+import multiprocessing as mp
+from io import BytesIO
+from datetime import datetime, date, timedelta
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+import requests
+from requests.adapters import HTTPAdapter
+import pyarrow as pa
+import pyarrow.feather as feather
+from openpyxl import load_workbook
+
+
+# ======================================================
+# CONFIG
+# ======================================================
+CACHE_DIR = os.environ.get("TORPEDO_CACHE_DIR", ".torpedo_cache")
+CACHE_LIMITE_MB = int(os.environ.get("TORPEDO_CACHE_MB", "512"))
+
+# amostra inicial usada para detectar encoding/separador do CSV
+TAMANHO_AMOSTRA_CSV = 64 * 1024
+
+# sobe quando o formato do snapshot mudar (invalida os antigos)
+VERSAO_SNAPSHOT = 4
+
+# várias fontes (planilhas por região/ano) baixadas/lidas ao mesmo tempo
+FONTES_WORKERS = int(os.environ.get("TORPEDO_FONTES_WORKERS", "4"))
+# parse de XLSX de várias fontes em processos (0 = um por núcleo; 1 = sem processos)
+FONTES_PROCESSOS = int(os.environ.get("TORPEDO_FONTES_PROCESSOS", "0")) or (os.cpu_count() or 1)
+
+
+# ======================================================
+# LAYOUT DA BASE (B/C/D/E/H + coluna de resultado por nome)
+# ======================================================
+COL_NOTAS = "NOTAS"
+COL_TIPO = "TIPO"
+COL_LOCAL = "LOCAL"
+COL_DATA = "DATA"
+COL_COLAB = "COLAB"
+COL_RESULTADO = "RESULTADO"
+COL_FONTE = "FONTE"  # nome da fonte (planilha/aba) de onde a linha veio
+
+COLUNAS_POSICIONAIS = {COL_NOTAS: 1, COL_TIPO: 2, COL_LOCAL: 3, COL_DATA: 4, COL_COLAB: 7}
+# colunas de texto repetitivo: guardadas como Categorical (códigos inteiros + dicionário) desde a leitura
+COLUNAS_CATEGORICAS = [COL_TIPO, COL_LOCAL, COL_COLAB, COL_RESULTADO]
+NOMES_RESULTADO = ["RESULTADO", "SITUA", "STATUS", "PARECER"]
+
+
+# ======================================================
+# DOWNLOAD (DRIVE)
+# ======================================================
+def _extrair_drive_id(url: str):
+    m = re.search(r"[?&]id=([a-zA-Z0-9-_]+)", url)
+    if m:
+        return m.group(1)
+    m = re.search(r"/file/d/([a-zA-Z0-9-_]+)", url)
+    if m:
+        return m.group(1)
+    return None
+
+def _drive_direct_download(url: str) -> str:
+    did = _extrair_drive_id(url)
+    if did:
+        return f"https://drive.google.com/uc?id={did}"
+    return url
+
+def _bytes_is_html(raw: bytes) -> bool:
+    head = raw[:800].lstrip().lower()
+    return head.startswith(b"<!doctype html") or b"<html" in head
+
+def _bytes_is_xlsx(raw: bytes) -> bool:
+    return raw[:2] == b"PK"
+
+# uma Session por processo: conexões reaproveitadas (keep-alive) entre fontes e recargas
+_sessao = {"http": None}
+_lock_sessao = threading.Lock()
+
+def sessao_http() -> requests.Session:
+    with _lock_sessao:
+        if _sessao["http"] is None:
+            s = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=FONTES_WORKERS, pool_maxsize=FONTES_WORKERS * 2)
+            s.mount("https://", adaptador)
+            s.mount("http://", adaptador)
+            _sessao["http"] = s
+        return _sessao["http"]
+
+def baixar_base(url_original: str) -> bytes:
+    url = _drive_direct_download(url_original)
+    r = sessao_http().get(url, timeout=60)
+    r.raise_for_status()
+    return r.content
+
+
+# ======================================================
+# REVALIDAÇÃO CONDICIONAL (ETag / Last-Modified / hash)
+# ======================================================
+def _caminho_meta(url: str) -> str:
+    nome = hashlib.blake2b(url.encode("utf-8"), digest_size=12).hexdigest()
+    return os.path.join(CACHE_DIR, "meta", f"{nome}.json")
+
+def _ler_meta(url: str) -> dict:
+    try:
+        with open(_caminho_meta(url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _arquivo_temporario(path: str) -> str:
+    # nome único por chamada (threads do mesmo processo gravam o mesmo destino em paralelo)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    return tmp
+
+def _gravar_meta(url: str, meta: dict):
+    path = _caminho_meta(url)
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = _arquivo_temporario(path)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp:
+            _remover_arquivo(tmp)
+
+# retorna (bytes, info) — bytes=None quando o servidor respondeu 304
+def baixar_base_condicional(url_original: str, aba=0) -> tuple[bytes | None, dict]:
+    url = _drive_direct_download(url_original)
+    meta = _ler_meta(url)
+
+    headers = {}
+    # só revalida se o snapshot da última versão (desta aba) ainda está em disco
+    if meta.get("hash") and os.path.exists(_caminho_snapshot(chave_snapshot(meta["hash"], aba))):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    r = sessao_http().get(url, headers=headers, timeout=60)
+    agora = datetime.now().isoformat(timespec="seconds")
+
+    if r.status_code == 304 and headers:
+        return None, {"status": "hit", "via": "304", "hash": meta["hash"], "quando": agora}
+
+    r.raise_for_status()
+    raw = r.content
+    chave = hash_conteudo(raw)
+
+    _gravar_meta(url, {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "hash": chave,
+    })
+
+    status = "hit" if chave == meta.get("hash") else "miss"
+    return raw, {"status": status, "via": "hash" if status == "hit" else "download", "hash": chave, "quando": agora}
+
+
+# ======================================================
+# PARSE (XLSX/CSV) — só as colunas usadas pelo dashboard
+# ======================================================
+def achar_coluna_por_nome(cabecalho: list, nomes_possiveis: list[str]):
+    cols = [str(c).upper().strip() for c in cabecalho]
+    for i, c in enumerate(cols):
+        for n in nomes_possiveis:
+            if n in c:
+                return i
+    return None
+
+def _indices_necessarios(cabecalho: list, largura: int) -> dict:
+    if largura < 8:
+        raise RuntimeError("A base precisa ter pelo menos até a coluna H (8 colunas).")
+
+    indices = dict(COLUNAS_POSICIONAIS)
+    i_res = achar_coluna_por_nome(cabecalho, NOMES_RESULTADO)
+    if i_res is not None:
+        indices[COL_RESULTADO] = i_res
+    return indices
+
+def ler_xlsx_enxuto(raw: bytes, aba=0) -> pd.DataFrame:
+    # read_only = streaming: as linhas são lidas do XML sob demanda, sem montar a planilha inteira
+    wb = load_workbook(BytesIO(raw), read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[aba] if isinstance(aba, int) else wb[aba]
+        linhas = ws.iter_rows(values_only=True)
+
+        # cabeçalho = primeira linha não vazia (mesmo critério do read_excel)
+        cabecalho = None
+        for r in linhas:
+            if any(v is not None and str(v).strip() for v in r):
+                cabecalho = list(r)
+                break
+        if cabecalho is None:
+            raise RuntimeError("Base vazia.")
+
+        while cabecalho and cabecalho[-1] is None:
+            cabecalho.pop()
+        largura = max(len(cabecalho), ws.max_column or 0)
+        indices = _indices_necessarios(cabecalho, largura)
+
+        nomes = list(indices.keys())
+        pegar = itemgetter(*indices.values())
+        n_min = max(indices.values()) + 1
+
+        valores = []
+        for r in linhas:
+            if len(r) < n_min:
+                r = tuple(r) + (None,) * (n_min - len(r))
+            v = pegar(r)
+            if any(x is not None for x in v):
+                valores.append(v)
+    finally:
+        wb.close()
+
+    if not valores:
+        return _categorizar(pd.DataFrame({n: pd.Series(dtype=object) for n in nomes}))
+
+    # transpõe uma vez: cada coluna vira um array (datas já chegam como datetime64)
+    colunas = zip(*valores)
+    del valores
+    return _categorizar(pd.DataFrame({n: _serie_tipada(c) for n, c in zip(nomes, colunas)}))
+
+def _serie_tipada(valores) -> pd.Series:
+    s = pd.Series(valores)
+    if s.dtype == object:
+        # célula vazia = NaN, igual ao read_excel
+        s = s.where(s.notna(), np.nan)
+    return s
+
+def _categorizar(df: pd.DataFrame) -> pd.DataFrame:
+    for c in COLUNAS_CATEGORICAS:
+        if c not in df.columns:
+            continue
+        s = df[c]
+        # categorias sempre texto (o mesmo que o astype(str) faria depois); NaN continua NaN
+        if s.dtype == object:
+            s = s.where(s.isna(), s.astype(str))
+        elif not isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype(str).where(s.notna(), np.nan)
+        df[c] = s.astype("category")
+    return df
+
+def _detectar_encoding(amostra: bytes) -> str:
+    if amostra.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for enc in ["utf-8", "cp1252"]:
+        try:
+            # final=False: a amostra pode cortar um caractere multibyte no fim
+            codecs.getincrementaldecoder(enc)().decode(amostra, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin1"
+
+def _detectar_separador(linhas: list[str]) -> str:
+    try:
+        return csv.Sniffer().sniff("\n".join(linhas), delimiters=";,\t|").delimiter
+    except csv.Error:
+        cab = linhas[0] if linhas else ""
+        return max([";", ",", "\t", "|"], key=cab.count)
+
+def ler_csv_enxuto(raw: bytes) -> tuple[pd.DataFrame, dict]:
+    # encoding + separador decididos uma vez, numa amostra do início; depois um único parse no engine C
+    amostra = raw[:TAMANHO_AMOSTRA_CSV]
+    enc = _detectar_encoding(amostra)
+
+    linhas = amostra.decode(enc, errors="replace").splitlines()
+    if len(raw) > TAMANHO_AMOSTRA_CSV and len(linhas) > 1:
+        linhas = linhas[:-1]  # última linha da amostra pode estar cortada
+    linhas = [l for l in linhas if l.strip()][:50]
+    if not linhas:
+        raise RuntimeError("Base vazia.")
+
+    sep = _detectar_separador(linhas)
+    cabecalho = next(csv.reader([linhas[0]], delimiter=sep))
+    indices = _indices_necessarios(cabecalho, len(cabecalho))
+
+    usecols = sorted(set(indices.values()))
+    # a amostra pode ser só ASCII e o resto cp1252: leitura estrita e, se falhar, o próximo
+    # encoding (latin1 aceita qualquer byte, então o laço sempre termina)
+    candidatos = [enc] + [e for e in ["cp1252", "latin1"] if e != enc]
+    for enc in candidatos:
+        try:
+            df = pd.read_csv(
+                BytesIO(raw),
+                sep=sep,
+                engine="c",
+                encoding=enc,
+                usecols=usecols,
+            )
+            break
+        except UnicodeDecodeError:
+            continue
+
+    pos = {i: k for k, i in enumerate(usecols)}
+    df = pd.DataFrame({n: df.iloc[:, pos[i]].to_numpy() for n, i in indices.items()})
+    return _categorizar(df), {"formato": "csv", "encoding": enc, "sep": sep, "engine": "c"}
+
+def _tipar_datas(df: pd.DataFrame) -> pd.DataFrame:
+    # DATA sai daqui já como datetime64: export do Excel mistura células de data e texto,
+    # e o snapshot precisa devolver exatamente o que o parse devolveu
+    if COL_DATA in df.columns and not pd.api.types.is_datetime64_any_dtype(df[COL_DATA]):
+        df[COL_DATA] = pd.to_datetime(df[COL_DATA], errors="coerce", dayfirst=True)
+    return df
+
+def ler_base_bytes(raw: bytes, aba=0) -> tuple[pd.DataFrame, dict]:
+    if _bytes_is_html(raw):
+        raise RuntimeError("URL retornou HTML (provável permissão/link). No Drive: 'Qualquer pessoa com o link' (Visualizador).")
+
+    if _bytes_is_xlsx(raw):
+        return _tipar_datas(ler_xlsx_enxuto(raw, aba)), {"formato": "xlsx", "aba": aba}
+    df, leitura = ler_csv_enxuto(raw)
+    return _tipar_datas(df), leitura
+
+
+# ======================================================
+# SNAPSHOT EM DISCO (Feather, chave = hash do conteúdo)
+# ======================================================
+def hash_conteudo(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _pasta_snapshots() -> str:
+    return os.path.join(CACHE_DIR, "snapshots")
+
+# o mesmo arquivo pode alimentar várias fontes (uma por aba): cada aba tem seu snapshot
+def chave_snapshot(hash_raw: str, aba=0) -> str:
+    if aba in (0, None, ""):
+        return hash_raw
+    return f"{hash_raw}-{re.sub(r'[^A-Za-z0-9]+', '_', str(aba))}"
+
+def _caminho_snapshot(chave: str) -> str:
+    return os.path.join(_pasta_snapshots(), f"{chave}.v{VERSAO_SNAPSHOT}.feather")
+
+def _valor_para_texto(v):
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    if isinstance(v, datetime):
+        # um formato só (ISO): nada de ambiguidade dia/mês na volta
+        return v.isoformat(sep=" ")
+    return str(v)
+
+def _frame_para_arrow(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+
+    # colunas "object" com tipos misturados (comum em export do Excel) viram texto
+    df = df.copy()
+    for c in df.columns:
+        if df[c].dtype != object:
+            continue
+        try:
+            pa.array(df[c], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[c] = df[c].map(_valor_para_texto)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def ler_snapshot(chave: str) -> tuple[pd.DataFrame, dict] | None:
+    path = _caminho_snapshot(chave)
+    if not os.path.exists(path):
+        return None
+    try:
+        tabela = feather.read_table(path, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        _remover_arquivo(path)
+        return None
+
+    # "toca" o arquivo: a evicção é por mtime (LRU)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    meta = tabela.schema.metadata or {}
+    try:
+        leitura = json.loads(meta.get(b"torpedo_leitura", b"{}"))
+    except ValueError:
+        leitura = {}
+    return tabela.to_pandas(split_blocks=True), {**leitura, "snapshot": True}
+
+def gravar_snapshot(chave: str, df: pd.DataFrame, leitura: dict | None = None) -> bool:
+    path = _caminho_snapshot(chave)
+    tmp = None
+    try:
+        tabela = _frame_para_arrow(df)
+        # guarda junto como a base foi lida (formato/dialeto do CSV)
+        meta = dict(tabela.schema.metadata or {})
+        meta[b"torpedo_leitura"] = json.dumps(leitura or {}).encode("utf-8")
+        tabela = tabela.replace_schema_metadata(meta)
+        os.makedirs(_pasta_snapshots(), exist_ok=True)
+        tmp = _arquivo_temporario(path)
+        # sem compressão para permitir leitura via memory-map (zero-copy)
+        feather.write_feather(tabela, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except (OSError, ValueError, pa.ArrowException):
+        if tmp:
+            _remover_arquivo(tmp)
+        return False
+
+    _aplicar_limite_cache(manter=path)
+    return True
+
+def _remover_arquivo(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _aplicar_limite_cache(manter: str | None = None):
+    pasta = _pasta_snapshots()
+    limite = CACHE_LIMITE_MB * 1024 * 1024
+
+    arquivos = []
+    for nome in os.listdir(pasta):
+        if not nome.endswith(".feather"):
+            continue
+        p = os.path.join(pasta, nome)
+        try:
+            s = os.stat(p)
+        except OSError:
+            continue
+        arquivos.append((s.st_mtime, s.st_size, p))
+
+    total = sum(a[1] for a in arquivos)
+    for _mtime, tamanho, p in sorted(arquivos):
+        if total <= limite:
+            break
+        if p == manter:
+            continue
+        _remover_arquivo(p)
+        total -= tamanho
+
+# ler = quem faz o parse quando não há snapshot (ler_base_bytes ou um LeitorProcessos)
+def base_de_bytes(raw: bytes, chave: str | None = None, aba=0, ler=ler_base_bytes) -> tuple[pd.DataFrame, dict]:
+    chave = chave_snapshot(chave or hash_conteudo(raw), aba)
+    snap = ler_snapshot(chave)
+    if snap is not None:
+        return snap
+
+    df, leitura = ler(raw, aba)
+    gravar_snapshot(chave, df, leitura)
+    return df, {**leitura, "snapshot": False}
+
+def carregar_base_revalidando(url_original: str, aba=0, ler=ler_base_bytes) -> tuple[pd.DataFrame, dict]:
+    raw, info = baixar_base_condicional(url_original, aba)
+
+    if raw is None:
+        snap = ler_snapshot(chave_snapshot(info["hash"], aba))
+        if snap is not None:
+            df, leitura = snap
+            return df, {**info, "leitura": leitura}
+        # snapshot sumiu entre a checagem e a leitura: baixa de novo, sem condicional
+        raw = baixar_base(url_original)
+        info = {**info, "status": "miss", "via": "download", "hash": hash_conteudo(raw)}
+
+    df, leitura = base_de_bytes(raw, info["hash"], aba, ler)
+    return df, {**info, "leitura": leitura}
+
+
+# ======================================================
+# VÁRIAS FONTES (1 planilha/aba por região ou ano) → 1 base com COL_FONTE
+# ======================================================
+def normalizar_fontes(fontes: list) -> list[dict]:
+    # aceita {"url", "aba", "nome"} (st.secrets) ou só a URL
+    saida = []
+    for k, f in enumerate(fontes, start=1):
+        f = {"url": f} if isinstance(f, str) else dict(f)
+        aba = f.get("aba", 0)
+        if isinstance(aba, str) and aba.strip().isdigit():
+            aba = int(aba)
+        saida.append({"nome": str(f.get("nome") or f"FONTE {k}"), "url": f["url"], "aba": aba if aba != "" else 0})
+
+    # nomes repetidos viram categorias repetidas: desambigua pela posição
+    nomes = [f["nome"] for f in saida]
+    if len(set(nomes)) < len(nomes):
+        for k, f in enumerate(saida, start=1):
+            f["nome"] = f"{f['nome']} ({k})"
+    return saida
+
+class LeitorProcessos:
+    # O openpyxl é Python puro: em threads, os parses de XLSX se revezam no GIL e não
+    # ganham nada. Aqui cada XLSX é lido num processo (o DataFrame volta em pickle, bem mais
+    # barato que o parse). CSV fica na thread: o engine C já solta o GIL. O pool só sobe se
+    # alguma fonte precisar mesmo de parse (304/snapshot não parseiam nada).
+    def __init__(self, workers: int):
+        self.workers = max(1, int(workers))
+        self._ex = None
+        self._lock = threading.Lock()
+
+    def __call__(self, raw: bytes, aba=0) -> tuple[pd.DataFrame, dict]:
+        if self.workers <= 1 or _bytes_is_html(raw) or not _bytes_is_xlsx(raw):
+            return ler_base_bytes(raw, aba)
+        with self._lock:
+            if self._ex is None:
+                # spawn: o processo do Streamlit tem threads; fork poderia herdar locks presos
+                self._ex = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+        return self._ex.submit(ler_base_bytes, raw, aba).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            if self._ex is not None:
+                self._ex.shutdown()
+                self._ex = None
+
+def _carregar_fonte(fonte: dict, ler=ler_base_bytes) -> tuple[pd.DataFrame, dict]:
+    try:
+        return carregar_base_revalidando(fonte["url"], fonte["aba"], ler)
+    except Exception as e:
+        raise RuntimeError(f"Fonte '{fonte['nome']}': {e}") from e
+
+def carregar_fontes(fontes: list, workers: int | None = None) -> tuple[pd.DataFrame, dict]:
+    fontes = normalizar_fontes(fontes)
+    if not fontes:
+        raise RuntimeError("Nenhuma fonte configurada.")
+
+    # download (I/O) e CSV em threads; XLSX em processos quando há mais de uma fonte
+    workers = max(1, min(workers or FONTES_WORKERS, len(fontes)))
+    processos = min(FONTES_PROCESSOS, workers) if len(fontes) > 1 else 1
+    with LeitorProcessos(processos) as ler, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="torpedo-fonte") as ex:
+        resultados = list(ex.map(lambda f: _carregar_fonte(f, ler), fontes))
+
+    frames = [df for df, _ in resultados]
+    infos = [info for _, info in resultados]
+
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].copy()
+    df[COL_FONTE] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(frames), dtype="int16"), [len(f) for f in frames]),
+        categories=[f["nome"] for f in fontes],
+    )
+
+    if len(infos) == 1:
+        versao = infos[0]["hash"]
+        leitura = infos[0].get("leitura", {})
+    else:
+        h = hashlib.blake2b(digest_size=16)
+        for f, info in zip(fontes, infos):
+            h.update(f"{f['nome']}|{f['aba']}|{info['hash']}\n".encode("utf-8"))
+        versao = h.hexdigest()
+        leitura = {"formato": "+".join(sorted({str(i.get("leitura", {}).get("formato", "")) for i in infos}))}
+
+    vias = {i["via"] for i in infos}
+    return df, {
+        "status": "hit" if all(i["status"] == "hit" for i in infos) else "miss",
+        "via": "download" if "download" in vias else ("hash" if "hash" in vias else "304"),
+        "hash": versao,
+        "quando": max(i["quando"] for i in infos),
+        "leitura": leitura,
+        "fontes": [
+            {"nome": f["nome"], "aba": f["aba"], "status": i["status"], "via": i["via"], "linhas": len(d)}
+            for f, i, d in zip(fontes, infos, frames)
+        ],
+    }
+
+
+# ======================================================
+# BASE PREPARADA (normalizada e tipada, 1x por versão dos dados)
+# ======================================================
+def normalize_colab_series(s: pd.Series) -> pd.Series:
+    s = s.astype(str).str.upper().str.strip()
+    return s.replace({"": None, "NAN": None, "NONE": None, "NULL": None, "-": None})
+
+def _texto_upper(s: pd.Series) -> pd.Series:
+    return s.astype(str).str.upper().str.strip()
+
+def _texto_strip(s: pd.Series) -> pd.Series:
+    return s.astype(str).str.strip()
+
+def _mapear_categorias(s: pd.Series, func) -> pd.Series:
+    # aplica a normalização só no dicionário (valores distintos), não em cada linha;
+    # categorias que colapsam no mesmo texto (ex.: "Ana " e "ANA") viram uma só
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype("category")
+
+    # último item = como fica o NaN (código -1) depois da normalização
+    valores = pd.Series(list(s.cat.categories) + [np.nan], dtype=object)
+    novos = func(valores)
+    mapa, uniq = pd.factorize(novos, sort=True)
+
+    codigos = mapa[s.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=uniq), index=s.index)
+
+def _categoria_constante(valor: str, n: int) -> pd.Categorical:
+    return pd.Categorical.from_codes(np.zeros(n, dtype="int8"), categories=[valor])
+
+def preparar_base(df_raw: pd.DataFrame) -> pd.DataFrame:
+    datas = pd.to_datetime(df_raw[COL_DATA], errors="coerce", dayfirst=True)
+    ok = datas.notna().to_numpy()
+    raw = df_raw.loc[ok]
+    datas = datas[ok]
+
+    # base ordenada por data: os recortes por período viram busca binária (ConsultaBase.entre)
+    ordem = np.argsort(datas.to_numpy(), kind="stable")
+    raw = raw.iloc[ordem]
+    datas = datas.iloc[ordem]
+
+    iso = datas.dt.isocalendar()
+    df = pd.DataFrame({
+        COL_DATA: datas,
+        "_COLAB_": _mapear_categorias(raw[COL_COLAB], normalize_colab_series),
+        "_TIPO_": _mapear_categorias(raw[COL_TIPO], _texto_upper),
+        "_LOCAL_": _mapear_categorias(raw[COL_LOCAL], _texto_upper),
+        "_NOTA_ID_": _mapear_categorias(raw[COL_NOTAS], _texto_strip),
+        "_QTD_": np.ones(len(raw), dtype="int64"),
+        "_RES_": (
+            _mapear_categorias(raw[COL_RESULTADO], _texto_upper)
+            if COL_RESULTADO in raw.columns else _categoria_constante("", len(raw))
+        ),
+        "_FONTE_": (
+            _mapear_categorias(raw[COL_FONTE], _texto_strip)
+            if COL_FONTE in raw.columns else _categoria_constante("", len(raw))
+        ),
+        "_ANO_": datas.dt.year.astype("int16"),
+        "_SEMANA_": iso["week"].astype("int8"),
+        "_DOW_": datas.dt.weekday.astype("int8"),
+    })
+    return df.reset_index(drop=True)
+
+
+# ======================================================
+# RECORTES POR DATA (frame ordenado pela coluna de data → searchsorted)
+# ======================================================
+def _limites_datas(s: pd.Series, ini, fim) -> tuple[int, int]:
+    # [ini 00:00, fim 23:59:59...] em posições de um frame ordenado pela data
+    i = int(s.searchsorted(pd.Timestamp(ini).normalize(), side="left"))
+    j = int(s.searchsorted(pd.Timestamp(fim).normalize() + pd.Timedelta(days=1), side="left"))
+    return i, max(i, j)
+
+
+# ======================================================
+# CUBO DIÁRIO (dia × colaborador × tipo × localidade → notas)
+# ======================================================
+COLUNAS_CUBO = ["_COLAB_", "_TIPO_", "_LOCAL_"]
+
+def _somar_cubo(qtd: pd.Series, chaves: list) -> pd.DataFrame:
+    # dropna=False: linhas sem colaborador continuam contando nos totais
+    cubo = (
+        qtd.groupby(chaves, observed=True, dropna=False, sort=True)
+        .sum()
+        .reset_index()
+    )
+    dia = cubo["_DIA_"]
+    cubo["_ANO_"] = dia.dt.year.astype("int16")
+    cubo["_SEMANA_"] = dia.dt.isocalendar()["week"].astype("int8")
+    cubo["_DOW_"] = dia.dt.weekday.astype("int8")
+    return cubo
+
+def montar_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    dia = df[COL_DATA].dt.normalize().rename("_DIA_")
+    return _somar_cubo(df["_QTD_"], [dia] + [df[c] for c in COLUNAS_CUBO])
+
+def concatenar_categoricos(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    # concat simples de categóricos com dicionários diferentes viraria "object"
+    b = b[a.columns]
+    partes = {}
+    for c in a.columns:
+        if isinstance(a[c].dtype, pd.CategoricalDtype):
+            partes[c] = union_categoricals([a[c], b[c]], ignore_order=True)
+        else:
+            partes[c] = np.concatenate([a[c].to_numpy(), b[c].to_numpy()])
+    return pd.DataFrame(partes)
+
+def atualizar_cubo(cubo: pd.DataFrame, df_novas: pd.DataFrame) -> pd.DataFrame:
+    # soma as linhas novas no cubo existente (dias repetidos são reagregados)
+    cols = ["_DIA_"] + COLUNAS_CUBO + ["_QTD_"]
+    juntos = concatenar_categoricos(cubo[cols], montar_cubo(df_novas)[cols])
+    return _somar_cubo(juntos["_QTD_"], [juntos["_DIA_"]] + [juntos[c] for c in COLUNAS_CUBO])
+
+
+# ======================================================
+# INGESTÃO INCREMENTAL (planilha "append-mostly")
+# ======================================================
+def hash_linhas(df_raw: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(df_raw, index=False).to_numpy()
+
+def anexar_ordenado(df: pd.DataFrame, cauda: pd.DataFrame) -> pd.DataFrame:
+    if cauda.empty:
+        return df
+    juntos = concatenar_categoricos(df, cauda)
+    # marca d'água: cauda toda depois da última data = já está em ordem; senão reordena (estável)
+    if len(df) and cauda[COL_DATA].iloc[0] < df[COL_DATA].iloc[-1]:
+        ordem = np.argsort(juntos[COL_DATA].to_numpy(), kind="stable")
+        juntos = juntos.iloc[ordem].reset_index(drop=True)
+    return juntos
+
+# anterior = estado devolvido na carga anterior (ou None). Se as linhas antigas continuam
+# iguais e na mesma posição, só a cauda nova é normalizada e somada na base/cubo anteriores.
+def ingerir_base(df_raw: pd.DataFrame, anterior: dict | None = None) -> dict:
+    hashes = hash_linhas(df_raw)
+    n_ant = 0 if anterior is None else len(anterior["hashes"])
+    prefixo_igual = (
+        anterior is not None
+        and 0 < n_ant <= len(hashes)
+        and anterior["colunas"] == list(df_raw.columns)
+        and np.array_equal(hashes[:n_ant], anterior["hashes"])
+    )
+
+    if not prefixo_igual:
+        df = preparar_base(df_raw)
+        cubo = montar_cubo(df)
+        modo, novas = "completa", len(df_raw)
+    elif n_ant == len(hashes):
+        df, cubo = anterior["df"], anterior["cubo"]
+        modo, novas = "inalterada", 0
+    else:
+        cauda = preparar_base(df_raw.iloc[n_ant:])
+        df = anexar_ordenado(anterior["df"], cauda)
+        cubo = atualizar_cubo(anterior["cubo"], cauda) if len(cauda) else anterior["cubo"]
+        modo, novas = "incremental", len(df_raw) - n_ant
+
+    return {
+        "df": df,
+        "cubo": cubo,
+        "hashes": hashes,
+        "colunas": list(df_raw.columns),
+        "ingestao": {"modo": modo, "linhas_novas": novas},
+    }
+
+
+# ======================================================
+# ROLLUPS POR ANO (tendências: semana/mês × colaborador × localidade)
+# ======================================================
+def blocos_por_ano(cubo: pd.DataFrame) -> dict[int, tuple[int, int]]:
+    # cubo ordenado por _DIA_: cada ano é um bloco contíguo [i, j)
+    anos = cubo["_ANO_"].to_numpy()
+    if len(anos) == 0:
+        return {}
+    quebras = np.flatnonzero(np.diff(anos)) + 1
+    inicios = np.r_[0, quebras]
+    fins = np.r_[quebras, len(anos)]
+    return {int(anos[i]): (int(i), int(j)) for i, j in zip(inicios, fins)}
+
+def versoes_por_ano(cubo: pd.DataFrame) -> dict[int, tuple[str, int, int]]:
+    # hash do conteúdo de cada ano (categóricos entram pelo valor, não pelo código):
+    # um upload que só mexe no ano corrente mantém o hash dos anos anteriores
+    cols = ["_DIA_"] + COLUNAS_CUBO + ["_QTD_"]
+    versoes = {}
+    for ano, (i, j) in blocos_por_ano(cubo).items():
+        h = pd.util.hash_pandas_object(cubo.iloc[i:j][cols], index=False).to_numpy()
+        versoes[ano] = (hashlib.blake2b(h.tobytes(), digest_size=16).hexdigest(), i, j)
+    return versoes
+
+def rollup_ano(cubo_ano: pd.DataFrame) -> pd.DataFrame:
+    dia = cubo_ano["_DIA_"].to_numpy()
+    chaves = [
+        pd.Series(dia.astype("datetime64[M]").astype("datetime64[ns]"), name="_MES_", index=cubo_ano.index),
+        pd.Series(dia - cubo_ano["_DOW_"].to_numpy().astype("timedelta64[D]"), name="_SEG_", index=cubo_ano.index),
+        cubo_ano["_COLAB_"],
+        cubo_ano["_LOCAL_"],
+    ]
+    return (
+        cubo_ano["_QTD_"]
+        .groupby(chaves, observed=True, dropna=False, sort=True)
+        .sum()
+        .reset_index()
+    )
+
+# periodo = "_SEG_" (semana, pela segunda-feira) ou "_MES_"; dim = "_COLAB_" ou "_LOCAL_"
+def serie_tendencia(rollups: list[pd.DataFrame], periodo: str, dim: str) -> pd.DataFrame:
+    partes = []
+    for r in rollups:
+        if r.empty:
+            continue
+        p = r.groupby([periodo, dim], observed=True)["_QTD_"].sum().reset_index()
+        p[dim] = p[dim].astype(str)
+        partes.append(p)
+    if not partes:
+        return pd.DataFrame(columns=[periodo, dim, "_QTD_"])
+
+    serie = pd.concat(partes, ignore_index=True)
+    # semana da virada do ano aparece nos dois rollups: soma de novo
+    return serie.groupby([periodo, dim], sort=True)["_QTD_"].sum().reset_index()
+
+
+# ======================================================
+# MATRIZ DENSA (linhas × colunas → soma, com zeros; sem grade/merge)
+# ======================================================
+# níveis = lista fixa (dias da semana, colaboradores, meses...): valores fora dela são
+# ignorados, combinações sem registro saem com 0. Um bincount sobre os códigos.
+def matriz_densa(linhas: pd.Series, colunas: pd.Series, pesos: pd.Series, niveis_linhas, niveis_colunas) -> np.ndarray:
+    nl, nc = len(niveis_linhas), len(niveis_colunas)
+    cl = np.asarray(pd.Categorical(linhas, categories=niveis_linhas).codes, dtype=np.int64)
+    cc = np.asarray(pd.Categorical(colunas, categories=niveis_colunas).codes, dtype=np.int64)
+    ok = (cl >= 0) & (cc >= 0)
+    w = np.nan_to_num(np.asarray(pesos, dtype="float64")[ok])
+    return np.bincount(cl[ok] * nc + cc[ok], weights=w, minlength=nl * nc).reshape(nl, nc)
+
+# a mesma matriz em formato longo (1 linha por célula, ordem linha→coluna), pronta para o px
+def tabela_densa(linhas: pd.Series, colunas: pd.Series, pesos: pd.Series, niveis_linhas, niveis_colunas,
+                 nomes: tuple[str, str], valor: str = "_QTD_") -> pd.DataFrame:
+    m = matriz_densa(linhas, colunas, pesos, niveis_linhas, niveis_colunas)
+    nl, nc = m.shape
+    return pd.DataFrame({
+        nomes[0]: np.repeat(np.asarray(niveis_linhas), nc),
+        nomes[1]: np.tile(np.asarray(niveis_colunas, dtype=object), nl),
+        valor: m.ravel().astype("int64"),
+    })
+
+
+# ======================================================
+# CONSULTA COMPONÍVEL (recorte de datas + filtros, materializa 1x)
+# ======================================================
+class ConsultaBase:
+    # Cada método devolve uma nova consulta (a original continua valendo), então dá pra
+    # ramificar: ano → período → localidade/tipo → semana. Nada é copiado até coletar().
+    def __init__(self, df: pd.DataFrame, col_data: str = COL_DATA, i: int = 0, j: int | None = None,
+                 filtros: tuple = (), datas: tuple | None = None):
+        self.df = df
+        self.col_data = col_data
+        self.i = i
+        self.j = len(df) if j is None else j
+        self.filtros = filtros
+        self.datas = datas  # (ini, fim) acumulados pelos entre(); permite refazer em outra base
+
+    def _nova(self, i: int | None = None, j: int | None = None, filtro=None, datas: tuple | None = None) -> "ConsultaBase":
+        i = self.i if i is None else max(self.i, i)
+        j = self.j if j is None else min(self.j, j)
+        filtros = self.filtros + ((filtro,) if filtro is not None else ())
+        return ConsultaBase(self.df, self.col_data, i, max(i, j), filtros, datas or self.datas)
+
+    # ---------- recortes de data (busca binária) ----------
+    # uma consulta derivada só estreita as datas, nunca amplia: o recorte novo é a interseção
+    # com o já aplicado (q.semana_iso(...).ano(...) continua na semana)
+    def entre(self, ini, fim) -> "ConsultaBase":
+        ini, fim = pd.Timestamp(ini).normalize(), pd.Timestamp(fim).normalize()
+        if self.datas is not None:
+            ini, fim = max(ini, self.datas[0]), min(fim, self.datas[1])
+        i, j = _limites_datas(self.df[self.col_data], ini, fim)
+        return self._nova(i, j, datas=(ini, fim))
+
+    def ano(self, ano: int) -> "ConsultaBase":
+        return self.entre(date(int(ano), 1, 1), date(int(ano), 12, 31))
+
+    def semana_iso(self, ano: int, semana: int, dias: int = 7) -> "ConsultaBase":
+        ini = date.fromisocalendar(int(ano), int(semana), 1)
+        return self.entre(ini, ini + timedelta(days=dias - 1))
+
+    # ---------- filtros (avaliados só dentro do recorte) ----------
+    # os códigos são resolvidos na base avaliada: o mesmo filtro vale no cubo e nas linhas
+    def onde(self, col: str, valores) -> "ConsultaBase":
+        if isinstance(valores, str):
+            valores = [valores]
+
+        def filtro(df, i, j):
+            cats = df[col].cat.categories
+            codigos = np.array([cats.get_loc(v) for v in valores if v in cats], dtype="int64")
+            return np.isin(df[col].array.codes[i:j], codigos)
+        return self._nova(filtro=filtro)
+
+    # busca textual: testa só as categorias (poucas) e filtra pelos códigos; OU entre as colunas
+    def contem(self, colunas: list[str], texto: str) -> "ConsultaBase":
+        texto = str(texto).strip()
+        if not texto:
+            return self
+
+        def filtro(df, i, j):
+            m = np.zeros(j - i, dtype=bool)
+            for col in colunas:
+                cats = df[col].cat.categories
+                hit = np.flatnonzero(cats.astype(str).str.contains(texto, case=False, regex=False))
+                m |= np.isin(df[col].array.codes[i:j], hit)
+            return m
+        return self._nova(filtro=filtro)
+
+    def ate(self, col: str, limite) -> "ConsultaBase":
+        return self._nova(filtro=lambda df, i, j: df[col].to_numpy()[i:j] <= limite)
+
+    def _mascara(self) -> np.ndarray | None:
+        m = None
+        for f in self.filtros:
+            r = f(self.df, self.i, self.j)
+            m = r if m is None else (m & r)
+        return m
+
+    def _valores(self, col: str) -> np.ndarray:
+        s = self.df[col]
+        v = s.array.codes if isinstance(s.dtype, pd.CategoricalDtype) else s.to_numpy()
+        v = v[self.i:self.j]
+        m = self._mascara()
+        return v if m is None else v[m]
+
+    # mesmos filtros (Localidade/Tipo...) sem recorte de datas: ponto de partida para um
+    # período mais largo que o atual (ex.: lote do ano inteiro a partir da semana exibida)
+    def sem_datas(self) -> "ConsultaBase":
+        return ConsultaBase(self.df, self.col_data, filtros=self.filtros)
+
+    # mesmo recorte de datas + filtros aplicados em outra base (ex.: cubo -> linhas)
+    def sobre(self, df: pd.DataFrame, col_data: str = COL_DATA) -> "ConsultaBase":
+        q = ConsultaBase(df, col_data, filtros=self.filtros)
+        return q.entre(*self.datas) if self.datas is not None else q
+
+    # ---------- resultados ----------
+    def posicoes(self) -> np.ndarray:
+        m = self._mascara()
+        if m is None:
+            return np.arange(self.i, self.j)
+        return self.i + np.flatnonzero(m)
+
+    # paginação no servidor: ordena só as posições do recorte e materializa uma página
+    def pagina(self, numero: int, tamanho: int, colunas: list[str] | None = None,
+               ordem: str | None = None, desc: bool = False) -> pd.DataFrame:
+        pos = self.posicoes()
+        if ordem is not None and not (ordem == self.col_data and not desc):
+            s = self.df[ordem]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                # posição alfabética de cada categoria; vazio (-1) vai pro fim
+                rank = np.append(np.argsort(np.argsort(s.cat.categories.astype(str))), len(s.cat.categories))
+                chave = rank[s.array.codes[pos]]
+            else:
+                chave = s.to_numpy()[pos]
+            idx = np.argsort(chave, kind="stable")
+            pos = pos[idx[::-1] if desc else idx]
+
+        ini = max(0, int(numero) - 1) * int(tamanho)
+        cols = slice(None) if colunas is None else [self.df.columns.get_loc(c) for c in colunas]
+        return self.df.iloc[pos[ini:ini + int(tamanho)], cols]
+
+    def coletar(self, colunas: list[str] | None = None) -> pd.DataFrame:
+        cols = slice(None) if colunas is None else [self.df.columns.get_loc(c) for c in colunas]
+        m = self._mascara()
+        if m is None:
+            return self.df.iloc[self.i:self.j, cols]
+        return self.df.iloc[self.i + np.flatnonzero(m), cols]
+
+    def __len__(self) -> int:
+        m = self._mascara()
+        return (self.j - self.i) if m is None else int(m.sum())
+
+    def vazia(self) -> bool:
+        return len(self) == 0
+
+    def soma(self, col: str = "_QTD_") -> int:
+        return int(self._valores(col).sum())
+
+    def limites(self) -> tuple | None:
+        v = self._valores(self.col_data)
+        if len(v) == 0:
+            return None
+        return pd.Timestamp(v[0]), pd.Timestamp(v[-1])
+
+    def unicos(self, col: str) -> list:
+        return np.unique(self._valores(col)).tolist()
+
+    def categorias(self, col: str) -> list[str]:
+        codigos = self._valores(col)
+        usados = np.unique(codigos[codigos >= 0])
+        return sorted(self.df[col].cat.categories[usados].tolist())
@@ -0,0 +1,93 @@
+import os, sqlite3
+from contextlib import closing
+from datetime import datetime
+
+from torpedo_dados import CACHE_DIR
+
+
+# ======================================================
+# CONFIG
+# ======================================================
+# arquivo local compartilhado por todas as sessões do processo (e entre reinícios)
+DEMANDAS_DB = os.environ.get("TORPEDO_DEMANDAS_DB", os.path.join(CACHE_DIR, "demandas.sqlite"))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS demandas (
+    semana     TEXT    NOT NULL,   -- segunda-feira (YYYY-MM-DD)
+    slot       INTEGER NOT NULL,   -- tabela 1..3
+    colab      TEXT    NOT NULL,
+    dia        TEXT    NOT NULL,   -- YYYY-MM-DD
+    demanda    TEXT    NOT NULL,
+    atualizado TEXT    NOT NULL,
+    PRIMARY KEY (semana, slot, colab, dia)
+);
+CREATE INDEX IF NOT EXISTS ix_demandas_semana_colab ON demandas (semana, colab);
+"""
+
+_criado = set()
+
+
+def _conectar(caminho: str = DEMANDAS_DB) -> sqlite3.Connection:
+    # 1 conexão por operação: o Streamlit roda cada sessão numa thread
+    if caminho not in _criado:
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    con = sqlite3.connect(caminho, timeout=10)
+    if caminho not in _criado:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(_ESQUEMA)
+        _criado.add(caminho)
+    return con
+
+
+# ======================================================
+# LEITURA (por semana)
+# ======================================================
+# {(slot, colab, dia): demanda} — "-" não é gravado, então ausência = "-"
+def ler_semana(semana: str, caminho: str = DEMANDAS_DB) -> dict:
+    with closing(_conectar(caminho)) as con:
+        linhas = con.execute(
+            "SELECT slot, colab, dia, demanda FROM demandas WHERE semana = ?", (semana,)
+        ).fetchall()
+    return {(slot, colab, dia): demanda for slot, colab, dia, demanda in linhas}
+
+# {(semana, colab, dia): demanda} para a exportação em lote (busca direta por tarefa).
+# a tabela de um colaborador é a mesma em qualquer slot: se ele tiver demandas em mais de
+# um slot no mesmo dia, vale a editada por último
+def ler_intervalo(semana_ini: str, semana_fim: str, caminho: str = DEMANDAS_DB) -> dict:
+    with closing(_conectar(caminho)) as con:
+        linhas = con.execute(
+            "SELECT semana, colab, dia, demanda FROM demandas WHERE semana BETWEEN ? AND ? "
+            "ORDER BY atualizado, slot DESC",
+            (semana_ini, semana_fim),
+        ).fetchall()
+    return {(sem, colab, dia): demanda for sem, colab, dia, demanda in linhas}
+
+
+# ======================================================
+# ESCRITA (em lote, 1 transação)
+# ======================================================
+# alteracoes = [(slot, colab, dia, demanda)]; demanda "-" apaga a entrada
+def gravar_lote(semana: str, alteracoes: list[tuple], caminho: str = DEMANDAS_DB) -> int:
+    if not alteracoes:
+        return 0
+    agora = datetime.now().isoformat(timespec="seconds")
+    gravar = [(semana, slot, colab, dia, dem, agora) for slot, colab, dia, dem in alteracoes if dem not in (None, "", "-")]
+    apagar = [(semana, slot, colab, dia) for slot, colab, dia, dem in alteracoes if dem in (None, "", "-")]
+
+    with closing(_conectar(caminho)) as con, con:
+        if gravar:
+            con.executemany(
+                "INSERT INTO demandas (semana, slot, colab, dia, demanda, atualizado) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (semana, slot, colab, dia) DO UPDATE SET demanda = excluded.demanda, atualizado = excluded.atualizado",
+                gravar,
+            )
+        if apagar:
+            con.executemany(
+                "DELETE FROM demandas WHERE semana = ? AND slot = ? AND colab = ? AND dia = ?",
+                apagar,
+            )
+    return len(alteracoes)
+
+def limpar_semana(semana: str, caminho: str = DEMANDAS_DB) -> int:
+    with closing(_conectar(caminho)) as con, con:
+        return con.execute("DELETE FROM demandas WHERE semana = ?", (semana,)).rowcount
@@ -0,0 +1,126 @@
+import os, re, zipfile
+import multiprocessing as mp
+from io import BytesIO
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from torpedo_dados import ConsultaBase
+from torpedo_visuais import pdf_torpedo_de_tabelas
+
+
+# ======================================================
+# CONFIG
+# ======================================================
+# 0 = um processo por núcleo
+LOTE_WORKERS = int(os.environ.get("TORPEDO_LOTE_WORKERS", "0")) or (os.cpu_count() or 1)
+DIAS_UTEIS = ["SEG", "TER", "QUA", "QUI", "SEX"]
+
+
+# ======================================================
+# TAREFAS (1 PDF cada) — montadas a partir do cubo diário
+# ======================================================
+def _slug(txt: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(txt)).strip("_") or "SEM_NOME"
+
+# demandas = {(semana, colab, dia): demanda} (torpedo_demandas.ler_intervalo)
+def _linhas_tabela(ini: date, nome: str, demandas: dict | None) -> tuple:
+    semana_key = ini.strftime("%Y-%m-%d")
+    demandas = demandas or {}
+    dias = [(ini + timedelta(days=i)).isoformat() for i in range(5)]
+    return tuple((d, DIAS_UTEIS[i], demandas.get((semana_key, nome, d), "-")) for i, d in enumerate(dias))
+
+def top_colaboradores(q: ConsultaBase, n: int = 3) -> list[str]:
+    base = q.coletar(["_COLAB_", "_QTD_"]).dropna(subset=["_COLAB_"])
+    if base.empty:
+        return []
+    return (
+        base.groupby("_COLAB_", observed=True)["_QTD_"]
+        .sum()
+        .sort_values(ascending=False)
+        .head(n)
+        .index.astype(str).tolist()
+    )
+
+# modo "semanas": 1 PDF por semana com as 3 maiores produções
+# modo "colaboradores": 1 PDF por (semana × colaborador), com os totais só daquela pessoa
+def montar_tarefas(q_filtro: ConsultaBase, ano: int, semanas: list[int], modo: str = "semanas",
+                   demandas: dict | None = None, colaboradores: list[str] | None = None) -> list[dict]:
+    # q_filtro vem recortado no período da tela: o lote parte da base inteira, só com os
+    # filtros (Localidade/Tipo); a semana ISO 1 pode começar em dezembro do ano anterior
+    q_base = q_filtro.sem_datas()
+    q_ano = q_base.ano(ano)
+    total_ano = q_ano.soma("_QTD_")
+    tarefas = []
+
+    for sem in semanas:
+        try:
+            ini = date.fromisocalendar(int(ano), int(sem), 1)
+        except ValueError:
+            continue
+        fim = ini + timedelta(days=4)
+        periodo_txt = f"{ini.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"
+
+        q_sem = q_base.semana_iso(ano, sem, dias=5).ate("_DOW_", 4)
+        if q_sem.vazia():
+            continue
+
+        if modo == "semanas":
+            nomes = top_colaboradores(q_sem, 3)
+            tabelas = tuple(
+                (f"TABELA {k} - {nome}", _linhas_tabela(ini, nome, demandas))
+                for k, nome in enumerate(nomes, start=1)
+            )
+            tarefas.append({
+                "arquivo": f"Torpedo_Semanal_{ano}_{ini.strftime('%Y%m%d')}.pdf",
+                "args": (str(ano), periodo_txt, q_sem.soma("_QTD_"), total_ano, tabelas),
+            })
+            continue
+
+        for nome in (colaboradores if colaboradores is not None else q_sem.categorias("_COLAB_")):
+            q_pessoa = q_sem.onde("_COLAB_", nome)
+            if q_pessoa.vazia():
+                continue
+            tabelas = ((f"TABELA - {nome}", _linhas_tabela(ini, nome, demandas)),)
+            tarefas.append({
+                "arquivo": f"{_slug(nome)}/Torpedo_{ano}_{ini.strftime('%Y%m%d')}_{_slug(nome)}.pdf",
+                "args": (str(ano), periodo_txt, q_pessoa.soma("_QTD_"), q_ano.onde("_COLAB_", nome).soma("_QTD_"), tabelas),
+            })
+
+    return tarefas
+
+
+# ======================================================
+# EXECUÇÃO (pool de processos) -> ZIP
+# ======================================================
+# roda no processo filho: só recebe tuplas (nada de DataFrame/Streamlit)
+def _gerar_pdf(tarefa: dict) -> tuple[str, bytes]:
+    return tarefa["arquivo"], pdf_torpedo_de_tabelas(*tarefa["args"])
+
+def exportar_lote(tarefas: list[dict], workers: int | None = None, progresso=None) -> bytes:
+    workers = LOTE_WORKERS if workers is None else max(1, int(workers))
+    total = len(tarefas)
+    pdfs = {}
+
+    if workers <= 1 or total < 2:
+        for k, t in enumerate(tarefas, start=1):
+            arquivo, pdf = _gerar_pdf(t)
+            pdfs[arquivo] = pdf
+            if progresso:
+                progresso(k, total)
+    else:
+        # spawn: o processo do Streamlit tem threads; fork poderia herdar locks presos
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, total), mp_context=ctx) as ex:
+            futuros = [ex.submit(_gerar_pdf, t) for t in tarefas]
+            for k, fut in enumerate(as_completed(futuros), start=1):
+                arquivo, pdf = fut.result()
+                pdfs[arquivo] = pdf
+                if progresso:
+                    progresso(k, total)
+
+    buf = BytesIO()
+    # PDF já é comprimido: ZIP_STORED evita gastar CPU à toa
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        for t in tarefas:
+            zf.writestr(t["arquivo"], pdfs[t["arquivo"]])
+    return buf.getvalue()
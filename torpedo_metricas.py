@@ -0,0 +1,84 @@
+import os, json, time, threading, tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from torpedo_dados import CACHE_DIR
+
+
+# ======================================================
+# CONFIG
+# ======================================================
+LOG_METRICAS = os.environ.get("TORPEDO_METRICAS_LOG", os.path.join(CACHE_DIR, "metricas.jsonl"))
+LOG_METRICAS_LIMITE_MB = int(os.environ.get("TORPEDO_METRICAS_MB", "20"))
+
+# tracemalloc é global no processo e deixa tudo mais lento: só liga quando pedido
+_memoria = {"ativa": os.environ.get("TORPEDO_METRICAS_MEMORIA") == "1"}
+_lock_log = threading.Lock()
+
+
+def ativar_memoria(ativa: bool):
+    _memoria["ativa"] = bool(ativa)
+    if ativa and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not ativa and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def memoria_ativa() -> bool:
+    return _memoria["ativa"]
+
+
+# ======================================================
+# MEDIDOR (1 por rerun)
+# ======================================================
+class MedidorRerun:
+    def __init__(self):
+        self.inicio = datetime.now().isoformat(timespec="seconds")
+        self.t0 = time.perf_counter()
+        self.etapas: dict[str, dict] = {}
+        self.gravado = False  # depois de gravar, reruns parciais (st.fragment) usam um medidor novo
+        ativar_memoria(memoria_ativa())
+
+    @contextmanager
+    def etapa(self, nome: str, linhas_in: int | None = None):
+        # chamar de novo com o mesmo nome acumula (etapas intercaladas com widgets)
+        reg = self.etapas.setdefault(nome, {
+            "etapa": nome, "tempo_ms": 0.0, "linhas_in": linhas_in, "linhas_out": None,
+            "alocado_bytes": None, "pico_bytes": None,
+        })
+        if linhas_in is not None:
+            reg["linhas_in"] = linhas_in
+
+        rastreando = tracemalloc.is_tracing()
+        if rastreando:
+            mem0, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+        t0 = time.perf_counter()
+        try:
+            yield reg
+        finally:
+            reg["tempo_ms"] = round(reg["tempo_ms"] + (time.perf_counter() - t0) * 1000, 2)
+            if rastreando:
+                mem1, pico = tracemalloc.get_traced_memory()
+                reg["alocado_bytes"] = (reg["alocado_bytes"] or 0) + (mem1 - mem0)
+                reg["pico_bytes"] = max(reg["pico_bytes"] or 0, pico - mem0)
+
+    def registros(self) -> list[dict]:
+        return list(self.etapas.values())
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.t0) * 1000, 2)
+
+    def gravar(self, extra: dict | None = None, caminho: str = LOG_METRICAS):
+        self.gravado = True
+        linha = {"quando": self.inicio, "total_ms": self.total_ms(), **(extra or {}), "etapas": self.registros()}
+        try:
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+            with _lock_log:
+                # rotação simples: guarda só o arquivo anterior (.1)
+                if os.path.exists(caminho) and os.path.getsize(caminho) > LOG_METRICAS_LIMITE_MB * 1024 * 1024:
+                    os.replace(caminho, caminho + ".1")
+                with open(caminho, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(linha, ensure_ascii=False, default=str) + "\n")
+        except OSError:
+            pass
@@ -0,0 +1,76 @@
+import html, operator
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from torpedo_cache import CacheLRU, hash_frame
+
+
+# ======================================================
+# CONFIG
+# ======================================================
+FRAGMENTOS_MAX = 256
+
+_fragmentos = CacheLRU(FRAGMENTOS_MAX)
+
+
+# ======================================================
+# FORMATAÇÃO POR COLUNA (1 chamada por coluna, não por linha)
+# ======================================================
+def coluna_data(s: pd.Series, fmt: str = "%d/%m/%Y") -> np.ndarray:
+    return pd.to_datetime(s).dt.strftime(fmt).fillna("").to_numpy(dtype=object)
+
+def coluna_texto(s: pd.Series) -> np.ndarray:
+    return s.astype("string").fillna("").to_numpy(dtype=object)
+
+def escapar(valores: np.ndarray) -> np.ndarray:
+    # escapa só os valores distintos (demandas/dias/colaboradores se repetem muito)
+    codigos, unicos = pd.factorize(valores)
+    if len(unicos) == 0:
+        return np.asarray(valores, dtype=object)
+    esc = np.array([html.escape(str(u), quote=True) for u in unicos], dtype=object)
+    return esc[codigos]
+
+def formatar_colunas(df: pd.DataFrame, colunas: list[str], datas: tuple = ("Data",)) -> list[np.ndarray]:
+    return [coluna_data(df[c]) if c in datas else coluna_texto(df[c]) for c in colunas]
+
+
+# ======================================================
+# HTML (fragmentos em cache pelo hash do conteúdo)
+# ======================================================
+def linhas_html(df: pd.DataFrame, colunas: list[tuple[str, str]], datas: tuple = ("Data",)) -> str:
+    # colunas = [(nome da coluna, classe css da <td> ou "")]
+    if df.empty:
+        return ""
+    valores = formatar_colunas(df, [c for c, _ in colunas], datas)
+    # concatenação elemento a elemento em arrays object: uma operação por coluna
+    celulas = [
+        (f"<td class='{classe}'>" if classe else "<td>") + escapar(v) + "</td>"
+        for v, (_, classe) in zip(valores, colunas)
+    ]
+    linhas = "<tr>" + reduce(operator.add, celulas) + "</tr>"
+    return "\n".join(linhas.tolist())
+
+def html_tabela(title: str, head_class: str, df: pd.DataFrame, colunas: list[tuple[str, str]],
+                datas: tuple = ("Data",)) -> str:
+    chave = hash_frame(df[[c for c, _ in colunas]], title, head_class, *colunas)
+
+    def montar():
+        body = linhas_html(df, colunas, datas)
+        return f"""
+    <div class="tblwrap">
+      <div class="tblhead {html.escape(head_class)}">{html.escape(str(title))}</div>
+      <table class="tbl"><tbody>{body}</tbody></table>
+    </div>
+    """
+    return _fragmentos.obter(chave, montar)
+
+
+# ======================================================
+# PDF (linhas prontas para o Table do ReportLab)
+# ======================================================
+def linhas_pdf(df: pd.DataFrame, colunas: list[str], datas: tuple = ("Data",)) -> list[list[str]]:
+    if df.empty:
+        return []
+    return [list(r) for r in zip(*formatar_colunas(df, colunas, datas))]
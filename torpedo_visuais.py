@@ -0,0 +1,222 @@
+import pandas as pd
+import plotly.express as px
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib import colors
+
+from torpedo_cache import CacheLRU, hash_frame
+from torpedo_dados import tabela_densa
+from torpedo_tabelas import html_tabela, linhas_pdf
+
+
+# ======================================================
+# CONSTANTES / HELPERS
+# ======================================================
+DOW_PT = {0: "SEG", 1: "TER", 2: "QUA", 3: "QUI", 4: "SEX", 5: "SÁB", 6: "DOM"}
+
+def fmt_int(n: int) -> str:
+    return f"{int(n):,}".replace(",", ".")
+
+
+# ======================================================
+# CACHE DE FIGURAS (hash das tabelas agregadas + opções de layout)
+# ======================================================
+# as tabelas de entrada são pequenas (dias × colaboradores): hashear custa bem menos que
+# montar e validar a figura do Plotly. A figura em cache é compartilhada entre sessões:
+# quem chama não deve alterá-la.
+FIGURAS_MAX = 64
+
+_figuras = CacheLRU(FIGURAS_MAX)
+
+def figura_em_cache(nome: str, dados: pd.DataFrame, opcoes: tuple, construir):
+    return _figuras.obter(hash_frame(dados, nome, *opcoes), construir)
+
+
+# ======================================================
+# TABELA TORPEDO (HTML)
+# ======================================================
+COLUNAS_TORPEDO = [("Data", "col-date"), ("DOW", "col-dow"), ("Demanda", "")]
+
+def html_torpedo_table(title: str, head_class: str, df_rows: pd.DataFrame) -> str:
+    return html_tabela(title, head_class, df_rows, COLUNAS_TORPEDO)
+
+
+# ======================================================
+# DONUT
+# ======================================================
+# df_base = cubo diário (ou a base linha a linha): só usa _COLAB_, _QTD_ e _ANO_
+def donut_colaborador_acumulado(df_base: pd.DataFrame, ano_ref: int | None):
+    if df_base.empty:
+        return None, 0
+
+    base = df_base
+    if ano_ref is not None:
+        base = base[base["_ANO_"] == int(ano_ref)]
+
+    base = base.dropna(subset=["_COLAB_"])
+    if base.empty:
+        return None, 0
+
+    dados = (
+        base.groupby("_COLAB_", observed=True)["_QTD_"]
+        .sum()
+        .reset_index()
+        .rename(columns={"_COLAB_": "Colaborador", "_QTD_": "Notas"})
+        .sort_values("Notas", ascending=False)
+    )
+    dados["Colaborador"] = dados["Colaborador"].astype(str)
+
+    total = int(dados["Notas"].sum())
+    fig = figura_em_cache("donut", dados, (ano_ref,), lambda: _figura_donut(dados, ano_ref, total))
+    return fig, total
+
+def _figura_donut(dados: pd.DataFrame, ano_ref: int | None, total: int):
+    fig = px.pie(
+        dados,
+        names="Colaborador",
+        values="Notas",
+        hole=0.65,
+        template="plotly_white"
+    )
+    fig.update_layout(
+        height=320,
+        margin=dict(l=10, r=10, t=55, b=10),
+        legend_title_text="",
+        title=f"NOTAS ATENDIDAS POR COLABORADOR - {ano_ref if ano_ref else ''}".strip()
+    )
+    fig.update_traces(textinfo="value")
+
+    fig.add_annotation(
+        x=0.5, y=0.5, xref="paper", yref="paper",
+        text=f"<b>{fmt_int(total)}</b><br><span style='font-size:11px'>TOTAL</span>",
+        showarrow=False
+    )
+    return fig
+
+
+# ======================================================
+# BARRAS (seg–sex × colaborador)
+# ======================================================
+DIAS_SEMANA = [0, 1, 2, 3, 4]
+
+# base = recorte da semana com _DOW_, _COLAB_ e _QTD_ (cubo diário ou linhas);
+# sai 1 linha por dia seg–sex × colaborador escolhido, zeros inclusos
+def agregar_barras_semana(base: pd.DataFrame, colabs: list[str]) -> pd.DataFrame:
+    niveis_colab = sorted(dict.fromkeys(str(x).upper().strip() for x in colabs))
+    tmp = tabela_densa(
+        base["_DOW_"], base["_COLAB_"], base["_QTD_"], DIAS_SEMANA, niveis_colab,
+        nomes=("DOW_NUM", "_COLAB_"), valor="Notas",
+    )
+    tmp.insert(1, "DOW", tmp["DOW_NUM"].map(DOW_PT))
+    return tmp
+
+def figura_barras(tmp: pd.DataFrame, barmode: str):
+    # tmp já traz a seleção de colaboradores (uma linha por dia × colaborador)
+    return figura_em_cache("barras", tmp, (barmode,), lambda: _figura_barras(tmp, barmode))
+
+def _figura_barras(tmp: pd.DataFrame, barmode: str):
+    fig_bar = px.bar(
+        tmp,
+        x="DOW",
+        y="Notas",
+        color="_COLAB_",
+        barmode=barmode,
+        text="Notas",
+        template="plotly_white",
+        category_orders={"DOW": ["SEG","TER","QUA","QUI","SEX"]},
+    )
+    fig_bar.update_layout(
+        height=320,
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend_title_text="Colaborador"
+    )
+    fig_bar.update_traces(textposition="outside", cliponaxis=False)
+
+    total_graf = int(tmp["Notas"].sum())
+    fig_bar.add_annotation(
+        xref="paper", yref="paper",
+        x=0.99, y=1.12,
+        text=f"<b>TOTAL SEMANAL: {fmt_int(total_graf)}</b>",
+        showarrow=False,
+        align="right"
+    )
+    return fig_bar
+
+
+# ======================================================
+# TENDÊNCIA (vários anos)
+# ======================================================
+def figura_tendencia(serie: pd.DataFrame, periodo: str, dim: str, legenda: str):
+    fig = px.line(
+        serie,
+        x=periodo,
+        y="_QTD_",
+        color=dim,
+        markers=True,
+        template="plotly_white",
+        labels={periodo: "", "_QTD_": "Notas", dim: legenda},
+    )
+    fig.update_layout(
+        height=420,
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend_title_text=legenda,
+        hovermode="x unified",
+    )
+    return fig
+
+
+# ======================================================
+# PDF
+# ======================================================
+def gerar_pdf_torpedo(ano_ref, periodo_txt, total_periodo, total_ano, tabelas_dict):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+    styles = getSampleStyleSheet()
+    elementos = []
+
+    elementos.append(Paragraph(f"<b>TORPEDO SEMANAL – PRODUTIVIDADE ({ano_ref})</b>", styles["Title"]))
+    elementos.append(Spacer(1, 10))
+    elementos.append(Paragraph(f"<b>Período:</b> {periodo_txt}", styles["Normal"]))
+    elementos.append(Paragraph(f"<b>Total do período:</b> {total_periodo}", styles["Normal"]))
+    elementos.append(Paragraph(f"<b>Total no ano:</b> {total_ano}", styles["Normal"]))
+    elementos.append(Spacer(1, 12))
+
+    elementos.append(Paragraph("<b>Demandas (seg–sex)</b>", styles["Heading2"]))
+    elementos.append(Spacer(1, 6))
+
+    for nome, df_tbl in (tabelas_dict or {}).items():
+        elementos.append(Paragraph(f"<b>{nome}</b>", styles["Heading3"]))
+        data = [["Data", "Dia", "Demanda"]] + linhas_pdf(df_tbl, ["Data", "DOW", "Demanda"])
+        t = Table(data, repeatRows=1, colWidths=[75, 35, 360])
+        t.setStyle(TableStyle([
+            ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
+            ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
+            ("FONT", (0,0), (-1,0), "Helvetica-Bold"),
+            ("FONTSIZE", (0,0), (-1,-1), 8),
+            ("VALIGN", (0,0), (-1,-1), "TOP"),
+        ]))
+        elementos.append(t)
+        elementos.append(Spacer(1, 10))
+
+    doc.build(elementos)
+    buffer.seek(0)
+    return buffer
+
+# tabelas manuais <-> tupla ((nome, ((data iso, dow, demanda), ...)), ...):
+# hashável (chave de cache) e leve de mandar para outro processo
+def tabelas_para_tupla(tabelas_dict: dict) -> tuple:
+    return tuple(
+        (nome, tuple((pd.Timestamp(r[0]).strftime("%Y-%m-%d"), r[1], r[2])
+                     for r in df_tbl[["Data", "DOW", "Demanda"]].itertuples(index=False, name=None)))
+        for nome, df_tbl in tabelas_dict.items()
+    )
+
+def pdf_torpedo_de_tabelas(ano_ref, periodo_txt, total_periodo, total_ano, tabelas: tuple) -> bytes:
+    tabelas_dict = {
+        nome: pd.DataFrame(list(linhas), columns=["Data", "DOW", "Demanda"])
+        for nome, linhas in tabelas
+    }
+    return gerar_pdf_torpedo(ano_ref, periodo_txt, total_periodo, total_ano, tabelas_dict).getvalue()